@@ -26,6 +26,7 @@ Consumer
 API
 ---
 """
+import functools
 import logging
 
 from twisted.internet import defer, task
@@ -46,7 +47,7 @@ class Stomp(object):
 
     :param config: A :class:`~.StompConfig` object.
     :param listenersFactory: The listeners which this (parameterless) function produces will be added to the connection each time :meth:`~.async.client.Stomp.connect` is called. The default behavior (:obj:`None`) is to use :func:`~.async.listener.defaultListeners` in the module :mod:`async.listener`. 
-    :param endpointFactory: This function produces a Twisted endpoint which will be used to establish the wire-level connection. It accepts two arguments **broker** (as it is produced by iteration over an :obj:`~.protocol.failover.StompFailoverTransport`) and **timeout** (connect timeout in seconds, :obj:`None` meaning that we will wait indefinitely). The default behavior (:obj:`None`) is to use :func:`~.async.util.endpointFactory` in the module :mod:`async.util`.
+    :param endpointFactory: This function produces a Twisted endpoint which will be used to establish the wire-level connection. It accepts two arguments **broker** (as it is produced by iteration over an :obj:`~.protocol.failover.StompFailoverTransport`) and **timeout** (connect timeout in seconds, :obj:`None` meaning that we will wait indefinitely). The default behavior (:obj:`None`) is to use :func:`~.async.util.endpointFactory` in the module :mod:`async.util`, which also applies the socket options of the :class:`~.StompConfig` object and the failover URI. A custom endpoint factory has to take care of socket options itself.
     
     .. note :: All API methods which may request a **RECEIPT** frame from the broker -- which is indicated by the **receipt** parameter -- will wait for the **RECEIPT** response until this client's :obj:`~.async.listener.ReceiptListener`'s **timeout** (given that one was added to this client, which by default is not the case). Here, "wait" is to be understood in the asynchronous sense that the method's :class:`twisted.internet.defer.Deferred` result will only call back then. If **receipt** is :obj:`None`, no such header is sent, and the callback will be triggered earlier.
 
@@ -59,7 +60,10 @@ class Stomp(object):
         self._session = StompSession(self._config.version, self._config.check)
 
         self._listenersFactory = listenersFactory or listener.defaultListeners
-        self._protocolCreator = self.protocolCreatorFactory(self._config.uri, endpointFactory or util.endpointFactory)
+        (uri, socketOptions) = util.splitSocketOptions(self._config.uri)
+        if endpointFactory is None:
+            endpointFactory = functools.partial(util.endpointFactory, socketOptions=util.socketOptions(self._config, socketOptions))
+        self._protocolCreator = self.protocolCreatorFactory(uri, endpointFactory)
 
         self.log = logging.getLogger(LOG_CATEGORY)
 
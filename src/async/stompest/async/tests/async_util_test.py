@@ -1,10 +1,14 @@
 import logging
+import socket
 
 from twisted.internet import defer, reactor, task
 from twisted.internet.defer import CancelledError
 from twisted.trial import unittest
 
-from stompest.async.util import exclusive, InFlightOperations
+from mock import Mock
+
+from stompest.async.util import exclusive, InFlightOperations, SocketOptionsEndpoint, socketOptions, splitSocketOptions
+from stompest.config import StompConfig
 from stompest.error import StompAlreadyRunningError, StompCancelledError
 
 logging.basicConfig(level=logging.DEBUG)
@@ -158,6 +162,31 @@ class InFlightOperationsTest(unittest.TestCase):
             self.assertEquals(list(op), [None])
         self.assertEquals(list(op), [])
 
+class SocketOptionsEndpointTest(unittest.TestCase):
+    @defer.inlineCallbacks
+    def test_socket_options_are_set_upon_connect(self):
+        protocol = Mock()
+        endpoint = Mock()
+        endpoint.connect.return_value = defer.succeed(protocol)
+        factory = object()
+        result = yield SocketOptionsEndpoint(endpoint, {'tcpNoDelay': True}).connect(factory)
+        self.assertIdentical(result, protocol)
+        endpoint.connect.assert_called_once_with(factory)
+        protocol.transport.getHandle.return_value.setsockopt.assert_called_once_with(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def test_socket_options_of_uri_and_config(self):
+        uri = 'failover:(tcp://localhost:61613)?tcpNoDelay=true,randomize=false,receiveBufferSize=65536'
+        self.assertEquals(splitSocketOptions(uri), ('failover:(tcp://localhost:61613)?randomize=false', {'tcpNoDelay': True, 'receiveBufferSize': 65536}))
+        self.assertEquals(splitSocketOptions('tcp://localhost:61613?keepAlive=false'), ('tcp://localhost:61613', {'keepAlive': False}))
+        self.assertEquals(splitSocketOptions('tcp://localhost:61613'), ('tcp://localhost:61613', {}))
+        self.assertRaises(ValueError, splitSocketOptions, 'tcp://localhost:61613?tcpNoDelay=yes')
+
+        config = StompConfig('tcp://localhost:61613')
+        self.assertEquals(socketOptions(config), {})
+        config.sendBufferSize = 4096
+        config.tcpNoDelay = False
+        self.assertEquals(socketOptions(config, {'tcpNoDelay': True}), {'sendBufferSize': 4096, 'tcpNoDelay': True})
+
 if __name__ == '__main__':
     import sys
     from twisted.scripts import trial
@@ -0,0 +1,223 @@
+"""End-to-end throughput benchmark of the sync and the async client against the in-process :class:`~.broker_simulator.StompBroker`. The broker runs on the Twisted reactor; sync clients run in threads of their own, async clients on the reactor, too. Producers send **--messages** messages in total to a queue; consumers share a subscription to that queue (the broker dispatches round-robin) and acknowledge according to **--ack**. Each message carries its send time, so the benchmark reports messages per second and the send-to-receive latency percentiles::
+
+    python -m stompest.async.tests.broker_benchmark --client sync --producers 2 --consumers 2 --messages 20000 --ack client-individual
+    python -m stompest.async.tests.broker_benchmark --client async --ack client --output async.json
+
+.. note :: Both clients and the broker share one machine (and, for async clients, one thread), so the results tell you about client overhead and relative changes rather than about the capacity of a real broker.
+"""
+import json
+import logging
+import optparse
+import sys
+import threading
+import time
+
+from twisted.internet import defer, reactor, task
+
+from webstompest.config import StompConfig as SyncStompConfig
+from webstompest.sync.client import Stomp as SyncStomp
+
+from stompest.async.client import Stomp as AsyncStomp
+from stompest.async.listener import ReceiptListener, SubscriptionListener
+from stompest.config import StompConfig as AsyncStompConfig
+from stompest.protocol import StompSpec
+
+from .broker_simulator import QueueStompServerFactory
+
+LOG_CATEGORY = __name__
+
+DESTINATION = '/queue/benchmark'
+SENT_HEADER = 'x-sent'
+ACK_INTERVAL = 100 # in ack mode client, ack every ACK_INTERVAL-th message (which acks all messages before it, too)
+YIELD_INTERVAL = 100 # async producers give the reactor a chance to run after this many messages
+SUBSCRIBE_TIMEOUT = 10 # seconds to wait for a sync consumer to be subscribed
+
+class Statistics(object):
+    """Collects the send-to-receive latencies of **messages** messages from any number of consumer threads."""
+    def __init__(self, messages):
+        self.messages = messages
+        self.latencies = []
+        self.start = self.end = None
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+
+    def received(self, frame):
+        now = time.time()
+        with self._lock:
+            if self.finished.is_set():
+                return False
+            self.latencies.append(now - float(frame.headers[SENT_HEADER]))
+            if len(self.latencies) == self.messages:
+                self.end = now
+                self.finished.set()
+            return True
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        seconds = self.end - self.start
+        return {
+            'messages': len(latencies),
+            'seconds': seconds,
+            'messagesPerSecond': len(latencies) / seconds,
+            'latency': dict(('p%d' % p, percentile(latencies, p)) for p in (50, 90, 99, 100))
+        }
+
+def percentile(values, p):
+    """The **p**-th percentile of a sorted :class:`list` of **values**."""
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+def shares(total, parts):
+    return [(total // parts) + (1 if (i < (total % parts)) else 0) for i in xrange(parts)]
+
+def headers(ack, consumer):
+    return {StompSpec.ACK_HEADER: ack, StompSpec.ID_HEADER: 'consumer-%d' % consumer}
+
+# sync clients
+
+def syncProducer(config, messages, body):
+    client = SyncStomp(config)
+    client.connect()
+    for _ in xrange(messages):
+        client.send(DESTINATION, body, {SENT_HEADER: '%.6f' % time.time()})
+    client.disconnect()
+
+def syncConsumer(config, consumer, ack, statistics, subscribed):
+    client = SyncStomp(config)
+    client.connect()
+    receipt = 'subscribed-%d' % consumer
+    client.subscribe(DESTINATION, headers(ack, consumer), receipt=receipt)
+    while client.receipt(client.receiveFrame()) != receipt:
+        pass
+    subscribed.set()
+    unacked = 0
+    while not statistics.finished.is_set():
+        if not client.canRead(0.1):
+            continue
+        frame = client.receiveFrame()
+        if not (frame and (frame.command == StompSpec.MESSAGE)):
+            continue
+        last = not statistics.received(frame) or statistics.finished.is_set()
+        if ack == StompSpec.ACK_CLIENT_INDIVIDUAL:
+            client.ack(frame)
+        elif ack == StompSpec.ACK_CLIENT:
+            unacked += 1
+            if (unacked == ACK_INTERVAL) or last:
+                client.ack(frame)
+                unacked = 0
+    client.disconnect()
+
+def runSync(config, producers, consumers, messages, size, ack, statistics):
+    threads, failures = [], []
+    def start(target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception:
+                failures.append(sys.exc_info())
+                statistics.finished.set() # let the other threads give up, too
+        thread = threading.Thread(target=run)
+        thread.daemon = True # a client which is stuck in a blocking call must not keep the process alive
+        thread.start()
+        threads.append(thread)
+
+    def check():
+        if failures:
+            (_, error, traceback) = failures[0]
+            raise error, None, traceback
+
+    for consumer in xrange(consumers):
+        subscribed = threading.Event()
+        start(syncConsumer, config, consumer, ack, statistics, subscribed)
+        deadline = time.time() + SUBSCRIBE_TIMEOUT
+        while not (subscribed.wait(0.1) or failures):
+            if time.time() > deadline:
+                statistics.finished.set()
+                raise RuntimeError('Consumer %d was not subscribed within %d seconds' % (consumer, SUBSCRIBE_TIMEOUT))
+        check()
+    statistics.start = time.time()
+    for share in shares(messages, producers):
+        start(syncProducer, config, share, size * 'x')
+    for thread in threads:
+        thread.join()
+    check()
+
+# async clients
+
+@defer.inlineCallbacks
+def asyncProducer(client, messages, body):
+    for i in xrange(messages):
+        client.send(DESTINATION, body, {SENT_HEADER: '%.6f' % time.time()})
+        if not (i % YIELD_INTERVAL):
+            yield task.deferLater(reactor, 0, lambda: None)
+    yield client.disconnect()
+
+@defer.inlineCallbacks
+def runAsync(config, producers, consumers, messages, size, ack, statistics):
+    finished = defer.Deferred()
+    def handler(client, frame):
+        if statistics.received(frame) and statistics.finished.is_set():
+            finished.callback(None)
+
+    clients = []
+    for consumer in xrange(consumers):
+        client = yield AsyncStomp(config).connect()
+        client.add(ReceiptListener())
+        yield client.subscribe(DESTINATION, headers(ack, consumer), receipt='subscribed-%d' % consumer, listener=SubscriptionListener(handler, ack=(ack != StompSpec.ACK_AUTO)))
+        clients.append(client)
+    producerClients = []
+    for _ in xrange(producers): # connect is exclusive, so we connect one client after the other
+        client = yield AsyncStomp(config).connect()
+        producerClients.append(client)
+    statistics.start = time.time()
+    yield defer.gatherResults([asyncProducer(client, share, size * 'x') for (client, share) in zip(producerClients, shares(messages, producers))])
+    yield finished
+    for client in clients:
+        client.disconnect()
+        yield client.disconnected
+
+def main(args=None):
+    parser = optparse.OptionParser(usage='python -m stompest.async.tests.broker_benchmark [options]')
+    parser.add_option('--client', choices=['sync', 'async'], default='sync', help='the client to benchmark (default: %default)')
+    parser.add_option('-p', '--producers', type='int', default=1, help='number of producer connections (default: %default)')
+    parser.add_option('-c', '--consumers', type='int', default=1, help='number of consumer connections (default: %default)')
+    parser.add_option('-n', '--messages', type='int', default=10000, help='total number of messages (default: %default)')
+    parser.add_option('-s', '--size', type='int', default=100, help='body size in bytes (default: %default)')
+    parser.add_option('-a', '--ack', choices=sorted([StompSpec.ACK_AUTO] + list(StompSpec.CLIENT_ACK_MODES)), default=StompSpec.ACK_AUTO, help='ack mode of the consumers (default: %default)')
+    parser.add_option('-v', '--version', choices=StompSpec.VERSIONS, default=StompSpec.VERSION_1_1, help='STOMP protocol version (default: %default)')
+    parser.add_option('-o', '--output', help='also write the results as JSON to this file')
+    (options, _) = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING)
+    port = reactor.listenTCP(0, QueueStompServerFactory(), interface='127.0.0.1') # @UndefinedVariable
+    uri = 'tcp://127.0.0.1:%d' % port.getHost().port
+    statistics = Statistics(options.messages)
+    arguments = (options.producers, options.consumers, options.messages, options.size, options.ack, statistics)
+    failures = []
+    if options.client == 'sync':
+        def run():
+            try:
+                runSync(SyncStompConfig(uri, version=options.version), *arguments)
+            except Exception as e:
+                failures.append(e)
+            reactor.callFromThread(reactor.stop) # @UndefinedVariable
+        reactor.callWhenRunning(threading.Thread(target=run).start) # @UndefinedVariable
+    else:
+        def run():
+            result = runAsync(AsyncStompConfig(uri, version=options.version), *arguments)
+            result.addErrback(failures.append)
+            result.addBoth(lambda _: reactor.stop()) # @UndefinedVariable
+        reactor.callWhenRunning(run) # @UndefinedVariable
+    reactor.run() # @UndefinedVariable
+    if failures:
+        raise SystemExit('Benchmark failed: %s' % failures[0])
+
+    results = dict(vars(options), **statistics.report())
+    latency = results['latency']
+    sys.stdout.write('%(client)s client, STOMP %(version)s, %(producers)d producer(s), %(consumers)d consumer(s), ack mode %(ack)s, %(size)d-byte bodies:' % results)
+    sys.stdout.write(' %.0f msgs/s, latency p50 %.2f ms, p99 %.2f ms, max %.2f ms\n' % (results['messagesPerSecond'], 1e3 * latency['p50'], 1e3 * latency['p99'], 1e3 * latency['p100']))
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
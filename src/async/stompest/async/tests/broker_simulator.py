@@ -1,3 +1,5 @@
+import collections
+import itertools
 import logging
 
 from twisted.internet import reactor
@@ -19,6 +21,7 @@ class BlackHoleStompServer(Protocol):
             StompSpec.DISCONNECT: self.handleDisconnect,
             StompSpec.SEND: self.handleSend,
             StompSpec.SUBSCRIBE: self.handleSubscribe,
+            StompSpec.UNSUBSCRIBE: self.handleUnsubscribe,
             StompSpec.ACK: self.handleAck,
             StompSpec.NACK: self.handleNack
         }
@@ -31,8 +34,9 @@ class BlackHoleStompServer(Protocol):
 
     def dataReceived(self, data):
         self._parser.add(data)
-
         for frame in iter(self._parser.get, self._parser.SENTINEL):
+            if not frame: # heart-beat
+                continue
             try:
                 self.log.debug('Received %s' % frame.info())
             except KeyError:
@@ -54,6 +58,9 @@ class BlackHoleStompServer(Protocol):
     def handleSubscribe(self, frame):
         pass
 
+    def handleUnsubscribe(self, frame):
+        pass
+
     def handleAck(self, frame):
         pass
 
@@ -106,6 +113,134 @@ class RemoteControlViaFrameStompServer(BlackHoleStompServer):
             pass
         self.transport.write(self.getFrame(StompSpec.MESSAGE, replyHeaders, 'hi'))
 
+class StompBroker(object):
+    """An in-memory stand-in for a STOMP broker: it keeps a queue per destination and dispatches the queued messages round-robin to the subscriptions on that destination. It is shared by all :class:`QueueStompServer` connections of a :class:`QueueStompServerFactory`."""
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.subscriptions = collections.defaultdict(list)
+        self._nextMessageId = itertools.count(1).next
+        self._nextSubscriber = collections.defaultdict(itertools.count)
+
+    def send(self, destination, headers, body):
+        headers[StompSpec.MESSAGE_ID_HEADER] = str(self._nextMessageId())
+        self.queues[destination].append((headers, body))
+        self.dispatch(destination)
+
+    def requeue(self, destination, messages):
+        self.queues[destination].extendleft(reversed(messages))
+        self.dispatch(destination)
+
+    def subscribe(self, server, destination, token):
+        self.subscriptions[destination].append((server, token))
+        self.dispatch(destination)
+
+    def unsubscribe(self, server, destination, token):
+        self.subscriptions[destination].remove((server, token))
+
+    def dispatch(self, destination):
+        queue, subscriptions = self.queues[destination], self.subscriptions[destination]
+        nextSubscriber = self._nextSubscriber[destination].next
+        while queue and subscriptions:
+            (server, token) = subscriptions[nextSubscriber() % len(subscriptions)]
+            (headers, body) = queue.popleft()
+            server.deliver(destination, token, headers, body)
+
+class QueueStompServer(BlackHoleStompServer):
+    """A connection to a :class:`StompBroker` which supports all STOMP protocol versions and the ack modes **auto**, **client**, and **client-individual**. Messages which are not acked when the connection is lost (or which are nacked) are redelivered."""
+    def connectionMade(self):
+        BlackHoleStompServer.connectionMade(self)
+        self.broker = self.factory.broker
+        self._subscriptions = {}
+
+    def connectionLost(self, reason):
+        BlackHoleStompServer.connectionLost(self, reason)
+        for token in self._subscriptions.keys():
+            self._unsubscribe(token)
+
+    def handleConnect(self, frame):
+        versions = frame.headers.get(StompSpec.ACCEPT_VERSION_HEADER, StompSpec.VERSION_1_0).split(',')
+        version = max(v for v in versions if v in StompSpec.VERSIONS)
+        self._parser.version = version
+        headers = {StompSpec.SESSION_HEADER: str(id(self))}
+        if version != StompSpec.VERSION_1_0:
+            headers.update({StompSpec.VERSION_HEADER: version, StompSpec.SERVER_HEADER: self.__class__.__name__, StompSpec.HEART_BEAT_HEADER: '0,0'})
+        self.transport.write(self.getFrame(StompSpec.CONNECTED, headers, ''))
+
+    def handleDisconnect(self, frame):
+        self._receipt(frame)
+        self.transport.loseConnection()
+
+    def handleSend(self, frame):
+        headers = dict(frame.headers)
+        headers.pop(StompSpec.RECEIPT_HEADER, None)
+        self.broker.send(headers.pop(StompSpec.DESTINATION_HEADER), headers, frame.body)
+        self._receipt(frame)
+
+    def handleSubscribe(self, frame):
+        headers = frame.headers
+        destination = headers[StompSpec.DESTINATION_HEADER]
+        token = headers.get(StompSpec.ID_HEADER)
+        self._subscriptions[token] = (destination, headers.get(StompSpec.ACK_HEADER, StompSpec.ACK_AUTO), collections.OrderedDict())
+        self.broker.subscribe(self, destination, token)
+        self._receipt(frame)
+
+    def handleUnsubscribe(self, frame):
+        self._unsubscribe(frame.headers.get(StompSpec.ID_HEADER))
+        self._receipt(frame)
+
+    def handleAck(self, frame):
+        self._acknowledge(frame)
+        self._receipt(frame)
+
+    def handleNack(self, frame):
+        (destination, messages) = self._acknowledge(frame)
+        self.broker.requeue(destination, messages)
+        self._receipt(frame)
+
+    def deliver(self, destination, token, headers, body):
+        (_, ack, unacked) = self._subscriptions[token]
+        messageId = headers[StompSpec.MESSAGE_ID_HEADER]
+        if ack in StompSpec.CLIENT_ACK_MODES:
+            unacked[messageId] = (headers, body)
+        headers = dict(headers)
+        headers[StompSpec.DESTINATION_HEADER] = destination
+        if token is not None:
+            headers[StompSpec.SUBSCRIPTION_HEADER] = token
+        if self._parser.version == StompSpec.VERSION_1_2:
+            headers[StompSpec.ACK_HEADER] = messageId
+        self.transport.write(self.getFrame(StompSpec.MESSAGE, headers, body))
+
+    def _acknowledge(self, frame):
+        header = StompSpec.ID_HEADER if (self._parser.version == StompSpec.VERSION_1_2) else StompSpec.MESSAGE_ID_HEADER
+        messageId = frame.headers[header]
+        for (destination, ack, unacked) in self._subscriptions.itervalues():
+            if messageId not in unacked:
+                continue
+            messages = []
+            while True: # in ack mode client, all messages up to this one are acknowledged
+                (_messageId, message) = unacked.popitem(last=False) if (ack == StompSpec.ACK_CLIENT) else (messageId, unacked.pop(messageId))
+                messages.append(message)
+                if _messageId == messageId:
+                    return destination, messages
+        raise StompFrameError('Unknown message: %s' % messageId)
+
+    def _receipt(self, frame):
+        receipt = frame.headers.get(StompSpec.RECEIPT_HEADER)
+        if receipt is not None:
+            self.transport.write(self.getFrame(StompSpec.RECEIPT, {StompSpec.RECEIPT_ID_HEADER: receipt}, ''))
+
+    def _unsubscribe(self, token):
+        (destination, _, unacked) = self._subscriptions.pop(token)
+        self.broker.unsubscribe(self, destination, token)
+        if unacked:
+            self.broker.requeue(destination, unacked.values())
+
+class QueueStompServerFactory(Factory):
+    protocol = QueueStompServer
+
+    def __init__(self):
+        self.broker = StompBroker()
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     factory = Factory()
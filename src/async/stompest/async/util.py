@@ -1,6 +1,7 @@
 import collections
 import contextlib
 import functools
+import socket
 
 from twisted.internet import defer, reactor, task
 from twisted.internet.endpoints import clientFromString
@@ -10,6 +11,21 @@ from stompest.util import cloneFrame
 
 MESSAGE_FAILED_HEADER = 'message-failed'
 
+_bool = {'true': True, 'false': False}.__getitem__
+
+# The stompest core which this client runs on neither parses these options in failover URIs nor knows how to apply
+# them, so the async client keeps its own table: option name -> (protocol level, option constant name, URI value parser).
+SOCKET_OPTIONS = {
+    'tcpNoDelay': ('IPPROTO_TCP', 'TCP_NODELAY', _bool),
+    'sendBufferSize': ('SOL_SOCKET', 'SO_SNDBUF', int),
+    'receiveBufferSize': ('SOL_SOCKET', 'SO_RCVBUF', int),
+    'keepAlive': ('SOL_SOCKET', 'SO_KEEPALIVE', _bool),
+    'keepAliveIdle': ('IPPROTO_TCP', 'TCP_KEEPIDLE', int),
+    'keepAliveInterval': ('IPPROTO_TCP', 'TCP_KEEPINTVL', int),
+    'keepAliveCount': ('IPPROTO_TCP', 'TCP_KEEPCNT', int),
+    'quickAck': ('IPPROTO_TCP', 'TCP_QUICKACK', _bool)
+}
+
 class InFlightOperations(collections.MutableMapping):
     def __init__(self, info):
         self._info = info
@@ -87,10 +103,53 @@ def exclusive(f):
 
     return _exclusive
 
-def endpointFactory(broker, timeout=None):
+def endpointFactory(broker, timeout=None, socketOptions=None):
     timeout = (':timeout=%d' % timeout) if timeout else ''
     locals().update(broker)
-    return clientFromString(reactor, '%(protocol)s:host=%(host)s:port=%(port)d%(timeout)s' % locals())
+    endpoint = clientFromString(reactor, '%(protocol)s:host=%(host)s:port=%(port)d%(timeout)s' % locals())
+    return SocketOptionsEndpoint(endpoint, socketOptions) if socketOptions else endpoint
+
+class SocketOptionsEndpoint(object):
+    """A client endpoint which wraps another one and tunes the socket of each connection it establishes (see :func:`~.util.setSocketOptions`)."""
+    def __init__(self, endpoint, socketOptions):
+        self.endpoint = endpoint
+        self.socketOptions = socketOptions
+
+    def connect(self, protocolFactory):
+        return self.endpoint.connect(protocolFactory).addCallback(self._setSocketOptions)
+
+    def _setSocketOptions(self, protocol):
+        setSocketOptions(protocol.transport.getHandle(), **self.socketOptions)
+        return protocol
+
+def setSocketOptions(socket_, **options):
+    """Apply socket options to the handle of a connected Twisted transport. Unset (:obj:`None`) options and options whose constant the :mod:`socket` module lacks on this platform are skipped."""
+    for (name, value) in options.iteritems():
+        (level, option, _) = SOCKET_OPTIONS[name]
+        if (value is None) or not hasattr(socket, option):
+            continue
+        socket_.setsockopt(getattr(socket, level), getattr(socket, option), int(value))
+
+def splitSocketOptions(uri):
+    """Separate the socket options (the keys of :attr:`SOCKET_OPTIONS`) from the other options of a failover URI. Returns the URI without the socket options, and the parsed socket options as a :class:`dict`."""
+    (base, _, options) = uri.partition('?')
+    (others, socketOptions) = ([], {})
+    for option in filter(None, options.split(',')):
+        (name, _, value) = option.partition('=')
+        if name in SOCKET_OPTIONS:
+            try:
+                socketOptions[name] = SOCKET_OPTIONS[name][2](value)
+            except (KeyError, ValueError):
+                raise ValueError('invalid uri: %s [invalid socket option: %s]' % (uri, option))
+        else:
+            others.append(option)
+    return (('%s?%s' % (base, ','.join(others))) if others else base), socketOptions
+
+def socketOptions(config, overrides=None):
+    """Collect the socket options for a connection: those set as attributes of **config**, with the ones from the failover URI (**overrides**, see :func:`splitSocketOptions`) taking precedence. Unset options are left out."""
+    options = dict((name, getattr(config, name, None)) for name in SOCKET_OPTIONS)
+    options.update(overrides or {})
+    return dict((name, value) for (name, value) in options.iteritems() if value is not None)
 
 def sendToErrorDestination(connection, failure, frame, errorDestination):
     """sendToErrorDestination(failure, frame, errorDestination)
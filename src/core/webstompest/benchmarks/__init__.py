@@ -0,0 +1,231 @@
+"""This module implements an offline micro-benchmark suite for the wire-level protocol layer of webstompest (:class:`~.StompParser` and :class:`~.StompFrame`) and for the sync transport. It needs neither a broker nor a network connection (the transport sends to a loopback socket), so you may run it before and after a change to spot throughput regressions::
+
+    python -m webstompest.benchmarks --output before.json
+    # ... apply your change ...
+    python -m webstompest.benchmarks --output after.json --compare before.json
+
+Each benchmark is run for all STOMP protocol versions, and it measures frames per second and bytes per second for
+
+* **parse**: the parser receives each frame in one piece,
+* **parse-split**: the parser receives each frame split into chunks of :attr:`SPLIT_SIZE` bytes (as if it straddled several reads),
+* **render**: a frame is created and rendered to its wire-level representation,
+
+with the following frames: **small** (a **MESSAGE** frame with a few headers and a short body), **large** (a **MESSAGE** frame with a 1 MB binary body and a **content-length** header), and **headers** (a **MESSAGE** frame with :attr:`HEADERS` headers). Additionally, **heart-beats** measures the parser on a stream of heart-beats which arrive one at a time (not for STOMP 1.0 which does not know heart-beats), and **escape** and **unescape** measure the (uncached) escaping of a header text with (**escaped-text**) and without (**plain-text**) characters to escape; here, a "frame" is one header text. Finally, **receive-ack** measures the round trip of a client which receives a **MESSAGE** frame and acknowledges it: the frame (**message**, which is the **headers** frame plus an **ack** header) is parsed, handed to a connected :class:`~.StompSession`, and the resulting **ACK** frame is rendered. **receive-ack-trusted** does the same with a trusted parser and session (see the **trusted** option of :class:`~.StompConfig`). **send** and **send-batch** measure the sync :class:`~.sync.transport.StompFrameTransport` which sends a **SEND** frame (**outgoing**) over a loopback connection, once with one write per frame, and once with one write per batch of :attr:`BATCH_SIZE` frames.
+
+The results are written as a JSON document (see :func:`run`) which you can feed back to the suite via the **--compare** option.
+"""
+import json
+import optparse
+import platform
+import socket
+import sys
+import threading
+import time
+import timeit
+
+from webstompest import FULL_VERSION
+from webstompest.protocol import StompFrame, StompParser, StompSession, StompSpec
+from webstompest.protocol.util import escape, unescape
+from webstompest.sync.transport import StompFrameTransport
+
+SPLIT_SIZE = 64
+BATCH_SIZE = 100
+HEADER_TEXTS = [('plain-text', u'ID-host-61616-1-1-0-1-1-1'), ('escaped-text', u'ID:host-61616-1-1:0:1:1:1')]
+HEADERS = 50
+LARGE_BODY_SIZE = 1024 * 1024
+MIN_TIME = 0.2
+REPEAT = 3
+
+def frames(version):
+    """The frames which are benchmarked for a given STOMP protocol **version**, as a :class:`list` of (name, :class:`~.StompFrame`) pairs."""
+    headers = {StompSpec.DESTINATION_HEADER: '/queue/test', StompSpec.MESSAGE_ID_HEADER: 'ID:host-61616-1-1:0:1:1:1', StompSpec.SUBSCRIPTION_HEADER: '0'}
+    largeBody = (LARGE_BODY_SIZE // 4) * '\xf0\x00\n\t'
+    manyHeaders = dict(headers)
+    manyHeaders.update(('x-header-%d' % i, 'value %d' % i) for i in xrange(HEADERS - len(headers)))
+    largeHeaders = dict(headers)
+    largeHeaders[StompSpec.CONTENT_LENGTH_HEADER] = str(len(largeBody))
+    return [
+        ('small', StompFrame(StompSpec.MESSAGE, headers, 'hello world', version=version)),
+        ('large', StompFrame(StompSpec.MESSAGE, largeHeaders, largeBody, version=version)),
+        ('headers', StompFrame(StompSpec.MESSAGE, manyHeaders, 'hello world', version=version))
+    ]
+
+def benchmarks(version):
+    """The benchmarks for a given STOMP protocol **version**, as a :class:`list` of (name, frame name, wire-level size of one frame, function) tuples. Each function takes the number of frames to process."""
+    result = []
+    for (name, frame) in frames(version):
+        wire = str(frame)
+        result.append(('parse', name, len(wire), _parse(version, [wire])))
+        result.append(('parse-split', name, len(wire), _parse(version, [wire[i:i + SPLIT_SIZE] for i in xrange(0, len(wire), SPLIT_SIZE)])))
+        result.append(('render', name, len(wire), _render(frame)))
+    if version != StompSpec.VERSION_1_0:
+        result.append(('heart-beats', 'heart-beat', len(StompSpec.LINE_DELIMITER), _parse(version, [StompSpec.LINE_DELIMITER])))
+    for (name, text) in HEADER_TEXTS:
+        escaped = escape(version)(StompSpec.SEND, text)
+        result.append(('escape', name, len(escaped), _transform(escape(version), StompSpec.SEND, text)))
+        result.append(('unescape', name, len(escaped), _transform(unescape(version), StompSpec.MESSAGE, escaped)))
+    frame = dict(frames(version))['headers']
+    headers = dict(frame.headers)
+    headers[StompSpec.ACK_HEADER] = '0'
+    wire = str(StompFrame(StompSpec.MESSAGE, headers, frame.body, version=version))
+    for (name, trusted) in [('receive-ack', False), ('receive-ack-trusted', True)]:
+        result.append((name, 'message', len(wire), _receive(version, wire, trusted)))
+    frame = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, 'hello world', version=version)
+    for (name, batchSize) in [('send', 1), ('send-batch', BATCH_SIZE)]:
+        result.append((name, 'outgoing', len(str(frame)), _send(frame, batchSize)))
+    return result
+
+def measure(function, minTime=MIN_TIME, repeat=REPEAT):
+    """Calibrate the number of frames such that a run of **function** takes at least **minTime** seconds, and return the number of frames together with the best time out of **repeat** runs."""
+    number = 1
+    while True:
+        elapsed = _time(function, number)
+        if elapsed >= minTime:
+            break
+        number *= 2 if (elapsed < (minTime / 10)) else max(2, int(1.2 * minTime / max(elapsed, 1e-9)))
+    return number, min([elapsed] + [_time(function, number) for _ in xrange(repeat - 1)])
+
+def run(versions=None, pattern=None, minTime=MIN_TIME, repeat=REPEAT, log=None):
+    """Run the benchmark suite and return the results as a :class:`dict` which you can serialize via :func:`json.dump`.
+
+    :param versions: The STOMP protocol versions to benchmark, or :obj:`None` (all versions).
+    :param pattern: Only run benchmarks whose id (see below) contains this string, or :obj:`None` (run all benchmarks).
+    :param minTime: See :func:`measure`.
+    :param repeat: See :func:`measure`.
+    :param log: A file-like object which each result is printed to as soon as it is available, or :obj:`None`.
+
+    The **results** entry maps the id of each benchmark (benchmark name, frame name, and STOMP protocol version, joined by slashes, e.g., ``parse/small/1.1``) to a :class:`dict` with the keys **frames**, **seconds**, **frameSize**, **framesPerSecond**, and **bytesPerSecond**.
+    """
+    results = {}
+    for version in (versions or StompSpec.VERSIONS):
+        for (name, frameName, frameSize, function) in benchmarks(version):
+            key = '/'.join((name, frameName, version))
+            if pattern and (pattern not in key):
+                continue
+            number, seconds = measure(function, minTime, repeat)
+            results[key] = {
+                'frames': number,
+                'seconds': seconds,
+                'frameSize': frameSize,
+                'framesPerSecond': number / seconds,
+                'bytesPerSecond': number * frameSize / seconds
+            }
+            if log:
+                log.write('%-32s %12.0f frames/s %12.3f MB/s\n' % (key, results[key]['framesPerSecond'], results[key]['bytesPerSecond'] / 1e6))
+    return {
+        'webstompest': FULL_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+
+def compare(results, reference):
+    """Compare **results** against **reference** results (both as returned by :func:`run`), and return a :class:`list` of (benchmark id, frames per second, reference frames per second, speedup) tuples for all benchmarks which occur in both."""
+    comparison = []
+    for (key, result) in sorted(results['results'].iteritems()):
+        try:
+            referenceResult = reference['results'][key]
+        except KeyError:
+            continue
+        comparison.append((key, result['framesPerSecond'], referenceResult['framesPerSecond'], result['framesPerSecond'] / referenceResult['framesPerSecond']))
+    return comparison
+
+def main(args=None):
+    parser = optparse.OptionParser(usage='python -m webstompest.benchmarks [options]')
+    parser.add_option('-o', '--output', help='write the results as JSON to this file (default: standard output)')
+    parser.add_option('-c', '--compare', metavar='FILE', help='compare the results against those in this JSON file')
+    parser.add_option('-v', '--version', action='append', dest='versions', choices=StompSpec.VERSIONS, help='only benchmark this STOMP protocol version (may be repeated)')
+    parser.add_option('-k', '--pattern', help='only run benchmarks whose id contains this string (e.g., parse-split or /1.2)')
+    parser.add_option('-t', '--min-time', type='float', default=MIN_TIME, dest='minTime', help='minimal duration of a run in seconds (default: %default)')
+    parser.add_option('-r', '--repeat', type='int', default=REPEAT, help='number of runs per benchmark; the best one counts (default: %default)')
+    (options, _) = parser.parse_args(args)
+
+    results = run(options.versions, options.pattern, options.minTime, options.repeat, log=sys.stderr)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    if options.compare:
+        with open(options.compare) as f:
+            reference = json.load(f)
+        for (key, framesPerSecond, referenceFramesPerSecond, speedup) in compare(results, reference):
+            sys.stderr.write('%-32s %12.0f frames/s (was %12.0f) %7.2fx\n' % (key, framesPerSecond, referenceFramesPerSecond, speedup))
+
+def _parse(version, chunks):
+    parser = StompParser(version)
+    def parse(number):
+        add, drain = parser.add, parser.drain
+        for _ in xrange(number):
+            for chunk in chunks:
+                add(chunk)
+            drain()
+    return parse
+
+def _render(frame):
+    (command, headers, body, version) = (frame.command, frame.headers, frame.body, frame.version)
+    def render(number):
+        for _ in xrange(number):
+            str(StompFrame(command, headers, body, version=version))
+    return render
+
+def _receive(version, wire, trusted):
+    parser = StompParser(version, trusted=trusted)
+    session = StompSession(version, trusted=trusted)
+    session.connect(versions=[version])
+    session.connected(StompFrame(StompSpec.CONNECTED, {StompSpec.VERSION_HEADER: version}))
+    session.subscribe('/queue/test', {StompSpec.ID_HEADER: '0'})
+    def receive(number):
+        add, get, message, ack = parser.add, parser.get, session.message, session.ack
+        for _ in xrange(number):
+            add(wire)
+            frame = get()
+            message(frame)
+            str(ack(frame))
+    return receive
+
+def _send(frame, batchSize):
+    (command, headers, body, version) = (frame.command, frame.headers, frame.body, frame.version)
+    def send(number):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        thread = threading.Thread(target=_drain, args=(listener,))
+        thread.daemon = True
+        thread.start()
+        transport = StompFrameTransport(*listener.getsockname())
+        try:
+            transport.connect()
+            for start in xrange(0, number, batchSize):
+                transport.cork()
+                for _ in xrange(min(batchSize, number - start)):
+                    transport.send(StompFrame(command, headers, body, version=version))
+                transport.uncork()
+        finally:
+            transport.disconnect()
+            thread.join()
+            listener.close()
+    return send
+
+def _drain(listener):
+    (connection, _) = listener.accept()
+    try:
+        while connection.recv(65536):
+            pass
+    finally:
+        connection.close()
+
+def _transform(transform, command, text):
+    def run(number):
+        for _ in xrange(number):
+            transform(command, text)
+    return run
+
+def _time(function, number):
+    start = timeit.default_timer()
+    function(number)
+    return timeit.default_timer() - start
@@ -0,0 +1,3 @@
+from webstompest.benchmarks import main
+
+main()
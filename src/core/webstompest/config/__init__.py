@@ -6,14 +6,52 @@ class StompConfig(object):
     :param passcode: The passcode for the STOMP brokers. The default is :obj:`None`, which means that no **passcode** header will be sent.
     :param version: A valid STOMP protocol version, or :obj:`None` (equivalent to the :attr:`DEFAULT_VERSION` attribute of the :class:`~.StompSpec` class).
     :param check: Decides whether the :class:`~.StompSession` object which is used to represent the STOMP sesion should be strict about the session's state: (e.g., whether to allow calling the session's :meth:`~.StompSession.send` when disconnected).
+    :param readSize: The initial (and minimal) number of bytes the sync transport tries to read from the socket at once. The default is :obj:`None`, which means 4096 bytes.
+    :param maxReadSize: The read size is doubled whenever a read fills it, and halved (but never below **readSize**) whenever a read fills less than half of it, but it will never exceed this value. The default is :obj:`None`, which means 256 kB. Set it to **readSize** to disable adaptive reads.
+    :param lazyHeaders: If :obj:`True`, incoming frames are parsed into :class:`~.frame.StompLazyFrame` objects whose headers are only decoded upon first access. This saves time for header-heavy frames of which you only inspect a few headers.
+    :param maxLineLength: The maximal length (in bytes) of the command line and of each header line of an incoming frame. The default is :obj:`None`, which means no limit.
+    :param maxHeaders: The maximal number of header lines of an incoming frame. The default is :obj:`None`, which means no limit.
+    :param maxBodySize: The maximal body size (in bytes) of an incoming frame. The default is :obj:`None`, which means no limit. A frame which exceeds any of these limits causes a :class:`~.error.StompFrameError`.
+    :param spillSize: Incoming bodies larger than this number of bytes are written to a temporary file and exposed as a read-only :class:`mmap.mmap` (see :class:`~.StompParser`). The default is :obj:`None`, which means that all bodies are kept in memory.
+    :param trusted: Decides whether incoming frames are trusted to conform to the STOMP specification. If :obj:`True`, the parser skips its command and body checks for all incoming frames (including **CONNECTED**), and the :class:`~.StompSession` object skips its command and mandatory header checks for **MESSAGE** and **RECEIPT** frames. The session still validates the **CONNECTED** frame. Use this only for connections to brokers you trust. The default is :obj:`False`.
+    :param writeBufferSize: If not :obj:`None`, the sync transport holds back outgoing frames until this many bytes have accumulated, and writes them to the socket in one piece. A frame of **JOIN_SIZE** bytes or more (see :class:`~.sync.transport.StompFrameTransport`) is written right away, after the pending frames (unless you send it within a :meth:`~.sync.client.Stomp.batch`). Pending frames are also written before the transport waits for incoming data, upon :meth:`~.sync.client.Stomp.flush`, and upon disconnect. The default is :obj:`None`, which means that each frame is written as soon as it is sent (unless you send it within a :meth:`~.sync.client.Stomp.batch`).
+    :param maxWriteDelay: If not :obj:`None`, pending outgoing frames are also written as soon as a frame is sent this many seconds (or more) after the oldest pending frame. There is no timer, so pending frames will not go out by themselves; flush them when you are done sending. The default is :obj:`None`.
+    :param tcpNoDelay: If :obj:`True`, disable Nagle's algorithm (**TCP_NODELAY**), which trades a few more packets for lower latency of small frames.
+    :param sendBufferSize: The size of the socket's send buffer in bytes (**SO_SNDBUF**).
+    :param receiveBufferSize: The size of the socket's receive buffer in bytes (**SO_RCVBUF**).
+    :param keepAlive: If :obj:`True`, enable TCP keep-alive probes (**SO_KEEPALIVE**) which detect dead peers on otherwise idle connections.
+    :param keepAliveIdle: The idle time in seconds before the first keep-alive probe (**TCP_KEEPIDLE**).
+    :param keepAliveInterval: The time in seconds between keep-alive probes (**TCP_KEEPINTVL**).
+    :param keepAliveCount: The number of unanswered keep-alive probes after which the connection is dropped (**TCP_KEEPCNT**).
+    :param quickAck: If :obj:`True`, acknowledge incoming data immediately instead of delaying the ACK (**TCP_QUICKACK**, Linux only; the sync transport re-arms it after each read because the kernel resets it).
+
+    .. note :: The socket options (**tcpNoDelay** through **quickAck**) default to :obj:`None`, which leaves the system defaults alone. You may also give them as options of the failover URI, which take precedence (see :class:`~.StompFailoverUri`).
 
     .. note :: Login and passcode have to be the same for all brokers because they are not part of the failover URI scheme.
 
     .. seealso :: The :class:`~.StompFailoverTransport` class which tells you which broker to use and how long you should wait to connect to it, the :class:`~.StompFailoverUri` which parses failover transport URIs.
     """
-    def __init__(self, uri, login=None, passcode=None, version=None, check=True):
+    def __init__(self, uri, login=None, passcode=None, version=None, check=True, readSize=None, maxReadSize=None, lazyHeaders=False, maxLineLength=None, maxHeaders=None, maxBodySize=None, spillSize=None, trusted=False, writeBufferSize=None, maxWriteDelay=None, tcpNoDelay=None, sendBufferSize=None, receiveBufferSize=None, keepAlive=None, keepAliveIdle=None, keepAliveInterval=None, keepAliveCount=None, quickAck=None):
         self.uri = uri
         self.login = login
         self.passcode = passcode
         self.version = version
         self.check = check
+        self.readSize = readSize
+        self.maxReadSize = maxReadSize
+        self.lazyHeaders = lazyHeaders
+        self.maxLineLength = maxLineLength
+        self.maxHeaders = maxHeaders
+        self.maxBodySize = maxBodySize
+        self.spillSize = spillSize
+        self.trusted = trusted
+        self.writeBufferSize = writeBufferSize
+        self.maxWriteDelay = maxWriteDelay
+        self.tcpNoDelay = tcpNoDelay
+        self.sendBufferSize = sendBufferSize
+        self.receiveBufferSize = receiveBufferSize
+        self.keepAlive = keepAlive
+        self.keepAliveIdle = keepAliveIdle
+        self.keepAliveInterval = keepAliveInterval
+        self.keepAliveCount = keepAliveCount
+        self.quickAck = quickAck
@@ -6,7 +6,7 @@
 
 import commands
 from failover import StompFailoverTransport, StompFailoverUri
-from frame import StompFrame
+from frame import StompFrame, StompFrameTemplate
 from parser import StompParser
 from spec import StompSpec
 from session import StompSession
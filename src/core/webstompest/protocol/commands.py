@@ -139,28 +139,30 @@ def unsubscribe(token, receipt=None, version=None):
         _checkHeader(frame, StompSpec.DESTINATION_HEADER)
     return frame
 
-def ack(frame, transactions=None, receipt=None):
+def ack(frame, transactions=None, receipt=None, trusted=False):
     """Create an **ACK** frame for a received **MESSAGE** frame.
     
     :param frame: The :class:`~.frame.StompFrame` object representing the **MESSAGE** frame we wish to ack.
     :param transactions: The ids of currently active transactions --- only if the **frame** is part of one of these transactions, the **transaction** header is included in the ACK frame.
     :param receipt: See :func:`disconnect`.
+    :param trusted: See :func:`message`.
     """
-    frame = StompFrame(StompSpec.ACK, _ackHeaders(frame, transactions), version=frame.version)
+    frame = StompFrame(StompSpec.ACK, _ackHeaders(frame, transactions, trusted), version=frame.version)
     _addReceiptHeader(frame, receipt)
     return frame
 
-def nack(frame, transactions=None, receipt=None):
+def nack(frame, transactions=None, receipt=None, trusted=False):
     """Create a **NACK** frame for a received **MESSAGE** frame.
     
     :param frame: The :class:`~.frame.StompFrame` object representing the **MESSAGE** frame we wish to nack.
     :param transactions: The ids of currently active transactions --- only if the **frame** is part of one of these transactions, the **transaction** header is included in the NACK frame.
     :param receipt: See :func:`disconnect`.
+    :param trusted: See :func:`message`.
     """
     version = frame.version
     if version == StompSpec.VERSION_1_0:
         raise StompProtocolError('%s not supported (version %s)' % (StompSpec.NACK, version))
-    frame = StompFrame(StompSpec.NACK, _ackHeaders(frame, transactions), version=frame.version)
+    frame = StompFrame(StompSpec.NACK, _ackHeaders(frame, transactions, trusted), version=frame.version)
     _addReceiptHeader(frame, receipt)
     return frame
 
@@ -246,11 +248,17 @@ def connected(frame, versions=None):
 
     return version, server, session, heartBeats
 
-def message(frame):
+def message(frame, trusted=False):
     """Handle a **MESSAGE** frame. Returns a token which you can use to match this message to its subscription.
     
+    :param trusted: If :obj:`True`, the frame is assumed to be valid (e.g., because it was received from a broker you trust), and neither its command nor its mandatory headers are checked.
+
     .. seealso :: The :func:`subscribe` command.
     """
+    if trusted:
+        headers = frame.headers
+        subscription = headers.get(StompSpec.SUBSCRIPTION_HEADER)
+        return (StompSpec.DESTINATION_HEADER, headers.get(StompSpec.DESTINATION_HEADER)) if (subscription is None) else (StompSpec.ID_HEADER, subscription)
     _checkCommand(frame, [StompSpec.MESSAGE])
     _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER)
     destination = _checkHeader(frame, StompSpec.DESTINATION_HEADER)
@@ -263,11 +271,14 @@ def message(frame):
     token = (StompSpec.DESTINATION_HEADER, destination) if (subscription is None) else (StompSpec.ID_HEADER, subscription)
     return token
 
-def receipt(frame):
+def receipt(frame, trusted=False):
     """Handle a **RECEIPT** frame. Returns the receipt id which you can use to match this receipt to the command that requested it.
+
+    :param trusted: See :func:`message`.
     """
-    _checkCommand(frame, [StompSpec.RECEIPT])
-    _checkHeader(frame, StompSpec.RECEIPT_ID_HEADER)
+    if not trusted:
+        _checkCommand(frame, [StompSpec.RECEIPT])
+        _checkHeader(frame, StompSpec.RECEIPT_ID_HEADER)
     return frame.headers[StompSpec.RECEIPT_ID_HEADER]
 
 def error(frame):
@@ -280,19 +291,21 @@ versions = _versions = StompSpec.versions
 
 # private helper methods
 
-def _ackHeaders(frame, transactions):
+def _ackHeaders(frame, transactions, trusted=False):
     version = frame.version
-    _checkCommand(frame, [StompSpec.MESSAGE])
-    _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER)
-    if version != StompSpec.VERSION_1_0:
-        _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER)
+    if not trusted:
+        _checkCommand(frame, [StompSpec.MESSAGE])
+        _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER)
+        if version != StompSpec.VERSION_1_0:
+            _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER)
     if version in (StompSpec.VERSION_1_0, StompSpec.VERSION_1_1):
         keys = {
             StompSpec.SUBSCRIPTION_HEADER: StompSpec.SUBSCRIPTION_HEADER,
             StompSpec.MESSAGE_ID_HEADER: StompSpec.MESSAGE_ID_HEADER
         }
     else:
-        _checkHeader(frame, StompSpec.ACK_HEADER)
+        if not trusted:
+            _checkHeader(frame, StompSpec.ACK_HEADER)
         keys = {StompSpec.ACK_HEADER: StompSpec.ID_HEADER}
     try:
         transaction = frame.headers[StompSpec.TRANSACTION_HEADER]
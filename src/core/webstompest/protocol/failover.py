@@ -53,6 +53,11 @@ class StompFailoverTransport(object):
             for broker in self._brokers():
                 yield broker, self._delay()
 
+    @property
+    def socketOptions(self):
+        """The socket options given in the failover URI (see :class:`StompFailoverUri`)."""
+        return self._failoverUri.socketOptions
+
     @classmethod
     def isLocalHost(cls, host):
         if host == 'localhost' or cls._REGEX_LOCALHOST_IPV4.match(host):
@@ -154,9 +159,19 @@ class StompFailoverUri(object):
     *randomize*                    bool      :obj:`True`   use a random algorithm to choose the the URI to use for
     reconnect from the list provided
     *priorityBackup*               bool      :obj:`False`  if set, prefer local connections to remote connections
+    *tcpNoDelay*                   bool      :obj:`None`   socket option **TCP_NODELAY** (see :class:`~.StompConfig`)
+    *sendBufferSize*               int       :obj:`None`   socket option **SO_SNDBUF**
+    *receiveBufferSize*            int       :obj:`None`   socket option **SO_RCVBUF**
+    *keepAlive*                    bool      :obj:`None`   socket option **SO_KEEPALIVE**
+    *keepAliveIdle*                int       :obj:`None`   socket option **TCP_KEEPIDLE** (in s)
+    *keepAliveInterval*            int       :obj:`None`   socket option **TCP_KEEPINTVL** (in s)
+    *keepAliveCount*               int       :obj:`None`   socket option **TCP_KEEPCNT**
+    *quickAck*                     bool      :obj:`None`   socket option **TCP_QUICKACK**
     =============================  ========= =============
     ================================================================
 
+    The socket options are not part of :attr:`options`; those which are given are available in the attribute :attr:`socketOptions`. The class attribute :attr:`SOCKET_OPTIONS` maps each of their names to the socket option it stands for.
+
     .. seealso :: :class:`StompFailoverTransport`, `failover transport
     <http://activemq.apache.org/failover-transport-reference.html>`_ of ActiveMQ.
     """
@@ -187,6 +202,18 @@ class StompFailoverUri(object):
         # 'updateURIsSupported': _configurationOption(_bool, True), # determines whether the client should accept
         # updates to its list of known URIs from the connected broker
     }
+    # socket option name -> (protocol level, option constant name, URI option parser); this is also the table which
+    # webstompest.util.setSocketOptions applies, and it skips the constants which the platform lacks
+    SOCKET_OPTIONS = {
+        'tcpNoDelay': ('IPPROTO_TCP', 'TCP_NODELAY', _bool),
+        'sendBufferSize': ('SOL_SOCKET', 'SO_SNDBUF', int),
+        'receiveBufferSize': ('SOL_SOCKET', 'SO_RCVBUF', int),
+        'keepAlive': ('SOL_SOCKET', 'SO_KEEPALIVE', _bool),
+        'keepAliveIdle': ('IPPROTO_TCP', 'TCP_KEEPIDLE', int),
+        'keepAliveInterval': ('IPPROTO_TCP', 'TCP_KEEPINTVL', int),
+        'keepAliveCount': ('IPPROTO_TCP', 'TCP_KEEPCNT', int),
+        'quickAck': ('IPPROTO_TCP', 'TCP_QUICKACK', _bool)
+    }
 
     def __init__(self, uri):
         self._parse(uri)
@@ -240,10 +267,15 @@ class StompFailoverUri(object):
 
     def _setOptions(self, options=None):
         _options = dict((k, o.default) for (k, o) in self._SUPPORTED_OPTIONS.iteritems())
+        _socketOptions = {}
         if options:
-            _options.update((k, self._SUPPORTED_OPTIONS[k].parser(v)) for (k, _, v) in
-                            (o.partition('=') for o in options.split(',')))
+            for (k, _, v) in (o.partition('=') for o in options.split(',')):
+                if k in self.SOCKET_OPTIONS:
+                    _socketOptions[k] = self.SOCKET_OPTIONS[k][2](v)
+                else:
+                    _options[k] = self._SUPPORTED_OPTIONS[k].parser(v)
         self.options = _options
+        self.socketOptions = _socketOptions
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
+import mmap
+
+from webstompest.error import StompFrameError
+
 from .spec import StompSpec
-from .util import escape
+from .util import headerDecoder, headerEncoder
 
 class StompFrame(object):
     """This object represents a STOMP frame.
@@ -10,6 +14,8 @@ class StompFrame(object):
     :param rawHeaders: The raw STOMP headers (represented as a collection of (header, value) pairs), or :obj:`None` (no raw headers).
     :param version: A valid STOMP protocol version, or :obj:`None` (equivalent to the :attr:`DEFAULT_VERSION` attribute of the :class:`~.StompSpec` class).
         
+    .. note :: If the frame has raw headers, its :attr:`headers` are their deduplicated version, which is computed once (until the raw headers are modified) and cannot be modified itself. Copy it (e.g., via :func:`dict`) if you need a modifiable version, or call :meth:`unraw`.
+
     .. note :: The frame's attributes are internally stored as arbitrary Python objects. The frame's :attr:`version` attribute controls the wire-level encoding of its :attr:`command` and :attr:`headers` (depending on STOMP protocol version, this may be ASCII or UTF-8), while its :attr:`body` is not encoded at all (it's just cast as a :class:`str`).
     
     **Example**:
@@ -50,10 +56,13 @@ class StompFrame(object):
     (u'SEND\\nsome french:fen\\xeatre\\n\\n\\x00', 28)
 
     """
+    __slots__ = ('command', 'body', '_headers', '_rawHeaders', '_version', '_wire')
+
     INFO_LENGTH = 20
     _KEYWORDS_AND_FIELDS = [('headers', '_headers', {}), ('body', 'body', ''), ('rawHeaders', 'rawHeaders', None), ('version', 'version', StompSpec.DEFAULT_VERSION)]
 
     def __init__(self, command, headers=None, body='', rawHeaders=None, version=None):
+        self._wire = None
         self.version = version
 
         self.command = command
@@ -62,11 +71,28 @@ class StompFrame(object):
         self.rawHeaders = rawHeaders
 
     def __eq__(self, other):
-        """Two frames are considered equal if, and only if, they render the same wire-level frame, that is, if their string representation is identical."""
-        return str(self) == str(other)
+        """Two frames are considered equal if, and only if, they render the same wire-level frame, that is, if their string representation is identical. Frames of the same protocol version are compared field by field without rendering them."""
+        if not (isinstance(other, StompFrame) and (self.version == other.version)):
+            return str(self) == str(other)
+        return (
+            (unicode(self.command) == unicode(other.command))
+            and (self._renderBody() == other._renderBody())
+            and (self._headerItems() == other._headerItems())
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
     __hash__ = None
 
+    def __getstate__(self):
+        return dict((field, getattr(self, field)) for field in StompFrame.__slots__ if field != '_wire')
+
+    def __setstate__(self, state):
+        self._wire = None
+        for (field, value) in state.iteritems():
+            setattr(self, field, value)
+
     def __iter__(self):
         yield ('command', self.command)
         for (keyword, field, default) in self._KEYWORDS_AND_FIELDS:
@@ -81,16 +107,26 @@ class StompFrame(object):
         ))
 
     def __str__(self):
-        """Render the wire-level representation of a STOMP frame."""
-        headers = sorted(self.headers.iteritems()) if self.rawHeaders is None else self.rawHeaders
-        headers = ''.join('%s:%s%s' % (self._encode(self._escape(unicode(key))), self._encode(self._escape(unicode(value))), StompSpec.LINE_DELIMITER) for (key, value) in headers)
-        return StompSpec.LINE_DELIMITER.join([self._encode(unicode(self.command)), headers, '%s%s' % (self.body, StompSpec.FRAME_DELIMITER)])
+        """Render the wire-level representation of a STOMP frame. The result is cached until the frame's :attr:`command`, :attr:`headers` (or :attr:`rawHeaders`), :attr:`body`, or :attr:`version` change."""
+        headers = self._renderHeaders()
+        key = (self.command, self._version, headers, self.body)
+        if (self._wire is None) or (self._wire[0] != key):
+            self._wire = (key, StompSpec.LINE_DELIMITER.join([self._encode(unicode(self.command)), headers, '%s%s' % (self._renderBody(), StompSpec.FRAME_DELIMITER)]))
+        return self._wire[1]
+
+    def buffers(self):
+        """Render the wire-level representation of a STOMP frame as a list of :class:`str` buffers whose concatenation is the string representation of the frame (see :meth:`__str__`). Unless the latter is cached already, the body is not copied but passed on as it is."""
+        headers = self._renderHeaders()
+        if (self._wire is not None) and (self._wire[0] == (self.command, self._version, headers, self.body)):
+            return [self._wire[1]]
+        body = buffer(self.body) if isinstance(self.body, mmap.mmap) else self._renderBody()
+        return [StompSpec.LINE_DELIMITER.join([self._encode(unicode(self.command)), headers, '']), body, StompSpec.FRAME_DELIMITER]
 
     def info(self):
         """Produce a log-friendly representation of the frame (show only non-trivial content, and truncate the message to INFO_LENGTH characters)."""
         headers = self.headers and 'headers=%s' % self.headers
         body = self.body[:self.INFO_LENGTH]
-        if body not in self.body:
+        if len(self.body) > self.INFO_LENGTH:
             body = '%s...' % body
         body = body and ('body=%s' % repr(body))
         version = 'version=%s' % self.version
@@ -108,16 +144,55 @@ class StompFrame(object):
     def _encode(self, text):
         return StompSpec.CODECS[self.version].encode(text)[0]
 
-    def _escape(self, text):
-        return escape(self.version)(self.command, text)
+    def _renderBody(self):
+        body = self.body
+        if isinstance(body, str):
+            return body
+        if isinstance(body, mmap.mmap): # a body which the parser has spilled to a temporary file
+            return body[:]
+        return '%s' % body
+
+    def _headerItems(self):
+        rawHeaders = self.rawHeaders
+        headers = sorted(self.headers.iteritems()) if rawHeaders is None else rawHeaders
+        return [(unicode(key), unicode(value)) for (key, value) in headers]
+
+    def _renderHeaderLines(self, headers):
+        encode = headerEncoder(self.version, self.command)
+        return ''.join('%s:%s%s' % (encode(key), encode(value), StompSpec.LINE_DELIMITER) for (key, value) in headers)
+
+    def _renderHeaders(self):
+        rawHeaders = self.rawHeaders
+        container = self._headers if (rawHeaders is None) else rawHeaders
+        cacheKey = (self.command, self._version)
+        cached = getattr(container, '_block', None)
+        if (cached is not None) and (cached[0] == cacheKey):
+            return cached[1]
+        block = self._renderHeaderLines(sorted(container.iteritems()) if rawHeaders is None else rawHeaders)
+        if isinstance(container, (_Headers, _RawHeaders)):
+            container._block = (cacheKey, block)
+        return block
 
     @property
     def headers(self):
-        return self._headers if (self.rawHeaders is None) else dict(reversed(self.rawHeaders))
+        rawHeaders = self.rawHeaders
+        if rawHeaders is None:
+            return self._headers
+        if isinstance(rawHeaders, _RawHeaders):
+            return rawHeaders.headers
+        return dict(reversed(rawHeaders))
 
     @headers.setter
     def headers(self, value):
-        self._headers = dict(value or {})
+        self._headers = _Headers(value or {})
+
+    @property
+    def rawHeaders(self):
+        return self._rawHeaders
+
+    @rawHeaders.setter
+    def rawHeaders(self, value):
+        self._rawHeaders = _RawHeaders(value) if (type(value) is list) else value
 
     def unraw(self):
         """If the frame has raw headers, copy their deduplicated version to the :attr:`headers` attribute, and remove the raw headers afterwards."""
@@ -126,6 +201,183 @@ class StompFrame(object):
         self.headers = self.headers
         self.rawHeaders = None
 
+class StompLazyFrame(StompFrame):
+    """This object represents a STOMP frame whose headers are kept as the undecoded wire-level header block (the :attr:`headerBlock` attribute) until they are accessed for the first time (via :attr:`headers`, :attr:`rawHeaders`, or any method which uses them). Only then the header block is decoded and unescaped according to the frame's :attr:`version`, and it is replaced by the resulting raw headers. Apart from that, it behaves exactly like a :class:`StompFrame`.
+
+    :param headerBlock: The wire-level header lines (without the empty line which terminates them), or :obj:`None` (no header block).
+
+    .. note :: Since decoding is deferred, a malformed header block will only raise a :class:`~.error.StompFrameError` (or a :class:`UnicodeDecodeError`) upon first access to the headers.
+
+    **Example**:
+
+    >>> from webstompest.protocol import StompSpec
+    >>> from webstompest.protocol.frame import StompLazyFrame
+    >>> frame = StompLazyFrame(StompSpec.MESSAGE, headerBlock='destination:/queue/test\\nmessage-id:007', version=StompSpec.VERSION_1_1)
+    >>> frame.headerBlock
+    'destination:/queue/test\\nmessage-id:007'
+    >>> frame.headers[StompSpec.MESSAGE_ID_HEADER]
+    u'007'
+    >>> frame.headerBlock is None
+    True
+
+    """
+    __slots__ = ('headerBlock',)
+
+    def __init__(self, command, headers=None, body='', rawHeaders=None, version=None, headerBlock=None):
+        StompFrame.__init__(self, command, headers, body, rawHeaders, version)
+        self.headerBlock = headerBlock
+
+    def __getstate__(self):
+        state = StompFrame.__getstate__(self)
+        state['headerBlock'] = self.headerBlock
+        return state
+
+    @property
+    def rawHeaders(self):
+        if self.headerBlock is not None:
+            self.rawHeaders = self._decodeHeaders(self.headerBlock)
+        return self._rawHeaders
+
+    @rawHeaders.setter
+    def rawHeaders(self, value):
+        self.headerBlock = None
+        StompFrame.rawHeaders.fset(self, value)
+
+    def _decodeHeaders(self, headerBlock):
+        if not headerBlock:
+            return []
+        decode = headerDecoder(self.version, self.command)
+        rawHeaders = []
+        for line in headerBlock.split(StompSpec.LINE_DELIMITER):
+            header = decode(line)
+            if header is None:
+                raise StompFrameError('No separator in header line: %s' % line)
+            rawHeaders.append(header)
+        return rawHeaders
+
+class StompFrameTemplate(object):
+    """This object pre-renders the wire-level static headers of frames which are sent over and over again with the same headers (e.g., **SEND** frames to a frequently used destination). Only the body, the **content-length** header (if requested), and the per-message headers are rendered when a frame is created from the template via :meth:`frame`.
+
+    :param command: A valid STOMP command.
+    :param headers: The static STOMP headers (represented as a :class:`dict`), or :obj:`None` (no static headers).
+    :param version: A valid STOMP protocol version, or :obj:`None` (equivalent to the :attr:`DEFAULT_VERSION` attribute of the :class:`~.StompSpec` class).
+    :param contentLength: Whether to add a **content-length** header to each frame (unless it is already part of the per-message headers).
+
+    .. note :: The frames created by a template are ordinary :class:`StompFrame` objects with raw headers whose wire-level rendering is already cached. The per-message headers precede the static ones, so they take precedence over static headers of the same name. Frames created from a template bypass the :class:`~.StompSession` logic, so you have to send them via :meth:`~.sync.client.Stomp.sendFrame`, and a **receipt** header among the per-message headers will not be tracked.
+
+    **Example**:
+
+    >>> from webstompest.protocol import StompFrameTemplate, StompSpec
+    >>> template = StompFrameTemplate(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, contentLength=True)
+    >>> frame = template.frame('hi', {'foo': 'bar'})
+    >>> frame
+    StompFrame(command=u'SEND', body='hi', rawHeaders=[('foo', 'bar'), (u'content-length', '2'), (u'destination', '/queue/test')])
+    >>> str(frame)
+    'SEND\\nfoo:bar\\ncontent-length:2\\ndestination:/queue/test\\n\\nhi\\x00'
+
+    """
+    def __init__(self, command, headers=None, version=None, contentLength=False):
+        self._prototype = StompFrame(command, headers, version=version)
+        self.contentLength = contentLength
+        self._rawHeaders = sorted(self._prototype.headers.iteritems())
+        self._block = self._prototype._renderHeaderLines(self._rawHeaders)
+
+    @property
+    def command(self):
+        return self._prototype.command
+
+    @property
+    def headers(self):
+        return dict(self._rawHeaders)
+
+    @property
+    def version(self):
+        return self._prototype.version
+
+    def frame(self, body='', headers=None):
+        """Create a frame from this template.
+
+        :param body: The frame body.
+        :param headers: The per-message STOMP headers (represented as a :class:`dict`), or :obj:`None` (no per-message headers).
+        """
+        rawHeaders = sorted(headers.iteritems()) if headers else []
+        if self.contentLength and not (headers and (StompSpec.CONTENT_LENGTH_HEADER in headers)):
+            rawHeaders.append((StompSpec.CONTENT_LENGTH_HEADER, str(len(body))))
+        prototype = self._prototype
+        block = (prototype._renderHeaderLines(rawHeaders) + self._block) if rawHeaders else self._block
+        rawHeaders.extend(self._rawHeaders)
+        frame = StompFrame(prototype.command, body=body, rawHeaders=rawHeaders, version=prototype.version)
+        frame.rawHeaders._block = ((frame.command, frame._version), block)
+        return frame
+
+class _Headers(dict):
+    """A header :class:`dict` which caches its wire-level rendering until it is modified."""
+    __slots__ = ('_block',)
+
+    def __init__(self, *args):
+        dict.__init__(self, *args)
+        self._block = None
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def _invalidate(self):
+        self._block = None
+
+class _RawHeaders(list):
+    """A list of raw headers which caches its deduplicated :class:`dict` version and its wire-level rendering until the list is modified."""
+    __slots__ = ('_headers', '_block')
+
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._invalidate()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = _ReadOnlyHeaders(reversed(self))
+        return self._headers
+
+    def _invalidate(self):
+        self._headers = self._block = None
+
+class _ReadOnlyHeaders(dict):
+    """The deduplicated version of raw headers which :class:`_RawHeaders` caches. Its copies (via :func:`dict` or :meth:`copy`) are ordinary :class:`dict` objects."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+def _readOnly(name):
+    def _method(self, *args, **kwargs):
+        raise TypeError('The headers of a frame with raw headers are read-only [%s() is not supported]' % name)
+    _method.__name__ = name
+    return _method
+
+for _name in ('__delitem__', '__setitem__', 'clear', 'pop', 'popitem', 'setdefault', 'update'):
+    setattr(_ReadOnlyHeaders, _name, _readOnly(_name))
+
+def _invalidating(method):
+    def _method(self, *args, **kwargs):
+        self._invalidate()
+        return method(self, *args, **kwargs)
+    _method.__name__ = method.__name__
+    return _method
+
+for (_class, _base, _names) in (
+    (_Headers, dict, ('__delitem__', '__setitem__', 'clear', 'pop', 'popitem', 'setdefault', 'update')),
+    (_RawHeaders, list, (
+        '__delitem__', '__delslice__', '__iadd__', '__imul__', '__setitem__', '__setslice__',
+        'append', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort'
+    ))
+):
+    for _name in _names:
+        setattr(_class, _name, _invalidating(getattr(_base, _name)))
+del _class, _base, _names, _name
+
 class StompHeartBeat(object):
     """This object represents a STOMP heart-beat. Its string representation (via :meth:`__str__`) renders the wire-level STOMP heart-beat."""
     __slots__ = ('version',)
@@ -144,5 +396,8 @@ class StompHeartBeat(object):
     def __str__(self):
         return StompSpec.LINE_DELIMITER
 
+    def buffers(self):
+        return [StompSpec.LINE_DELIMITER]
+
     def info(self):
         return 'heart-beat'
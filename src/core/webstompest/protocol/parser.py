@@ -1,16 +1,28 @@
 import collections
-import cStringIO
+import itertools
+import mmap
+import tempfile
 
 from webstompest.error import StompFrameError
 
-from .frame import StompFrame, StompHeartBeat
+from .frame import StompFrame, StompHeartBeat, StompLazyFrame
 from .spec import StompSpec
-from .util import unescape
+from .util import headerDecoder
 
 class StompParser(object):
     """This is a parser for a wire-level byte-stream of STOMP frames.
 
     :param version: A valid STOMP protocol version, or :obj:`None` (equivalent to the :attr:`DEFAULT_VERSION` attribute of the :class:`~.StompSpec` class).
+    :param lazy: If :obj:`True`, the parser will not decode any headers but the **content-length** header. Instead, it will produce :class:`~.frame.StompLazyFrame` objects which keep their header block undecoded until the headers are accessed for the first time.
+    :param maxLineLength: The maximal length (in bytes) of the command line and of each header line, or :obj:`None` (no limit).
+    :param maxHeaders: The maximal number of header lines per frame, or :obj:`None` (no limit).
+    :param maxBodySize: The maximal size (in bytes) of a frame body, or :obj:`None` (no limit).
+    :param spillSize: If not :obj:`None`, bodies larger than this number of bytes are not kept in memory but written to a temporary file while they arrive. The body of such a frame is a read-only :class:`mmap.mmap` of that file which you may use as a file-like object (e.g., via :meth:`~mmap.mmap.read`) or as a buffer (e.g., via slicing or :func:`buffer`).
+    :param trusted: If :obj:`True`, the parser trusts the wire format: it accepts any command (the command line is decoded unless it is a valid command), and it does not check whether a body is allowed for the frame's command.
+
+    .. note :: A run of consecutive heart-beats is reported as a single :class:`~.frame.StompHeartBeat` object (which is shared by all heart-beats of this parser) unless the heart-beats preceding it have already been consumed via :meth:`get` or :meth:`drain`.
+
+    .. note :: If a frame exceeds one of the limits, the parser raises a :class:`~.error.StompFrameError` as soon as it detects the violation (that is, without waiting for the rest of the frame), discards all unparsed data, and expects the next frame to begin with the data added afterwards.
 
     Example:
 
@@ -37,13 +49,24 @@ class StompParser(object):
     """
     SENTINEL = None
 
-    def __init__(self, version=None):
+    _CONTENT_LENGTH_PREFIX = str(StompSpec.CONTENT_LENGTH_HEADER + StompSpec.HEADER_SEPARATOR) # a byte string, so header blocks are never decoded implicitly
+
+    def __init__(self, version=None, lazy=False, maxLineLength=None, maxHeaders=None, maxBodySize=None, spillSize=None, trusted=False):
         self.version = version
+        self.lazy = lazy
+        self.trusted = trusted
+        self.maxLineLength = maxLineLength
+        self.maxHeaders = maxHeaders
+        self.maxBodySize = maxBodySize
+        self.spillSize = spillSize
+        self._buffer = bytearray()
+        self._bodyFile = None
         self._parsers = {
             'heart-beat': self._parseHeartBeat,
             'command': self._parseCommand,
-            'headers': self._parseHeader,
-            'body': self._parseBody
+            'headers': self._parseHeaderBlock if lazy else self._parseHeader,
+            'body': self._parseBody,
+            'spilled body': self._parseSpilledBody
         }
         self.reset()
 
@@ -59,29 +82,91 @@ class StompParser(object):
             return self._frames.popleft()
         return self.SENTINEL
 
+    def drain(self, max=None):
+        """Return all available frames (or at most **max** of them) as a :class:`list` of :class:`~.frame.StompFrame` objects. The list is empty if there are no frames available.
+        """
+        frames = self._frames
+        if (max is None) or (max >= len(frames)):
+            self._frames = collections.deque()
+            return list(frames)
+        return [frames.popleft() for _ in xrange(max)]
+
+    def feed(self, data):
+        """Add a byte-stream of wire-level data (see :meth:`add`), and return all frames which are available afterwards (see :meth:`drain`).
+        """
+        self.add(data)
+        return self.drain()
+
     def add(self, data):
         """Add a byte-stream of wire-level data.
 
-        :param data: An iterable of characters. If any character evaluates to :obj:`False`, that stream will no longer be consumed.
+        :param data: A :class:`str` chunk of wire-level data, or an iterable of characters. In the latter case, if any character evaluates to :obj:`False`, that stream will no longer be consumed.
+
+        .. note :: The data is scanned chunk-wise (not character by character). Only the tail of a frame which straddles two chunks is kept until more data arrives.
+        """
+        if not isinstance(data, str):
+            data = str(''.join(itertools.takewhile(bool, data)))
+        size = len(data)
+        self._reserve(size)
+        self._buffer[self._end:self._end + size] = data
+        self.commit(size)
+
+    def reserve(self, size):
+        """Obtain a writable :class:`memoryview` of **size** bytes of free space at the end of the parser's receive buffer. This allows you to fill the receive buffer directly (e.g., via :meth:`socket.socket.recv_into`) without allocating an intermediate :class:`str`. Afterwards, call :meth:`commit` with the number of bytes which were actually written.
+
+        .. note :: The view is only valid until the next call to :meth:`add` or :meth:`reserve`.
         """
-        for character in data:
-            if not character:
-                return
-            self.parse(character)
+        self._reserve(size)
+        return memoryview(self._buffer)[self._end:self._end + size]
+
+    def commit(self, size):
+        """Parse **size** bytes which have been written to the view obtained by :meth:`reserve`.
+        """
+        self._end += size
+        if (self._end - self._position) < self._required:
+            return
+        self._required = 0
+        try:
+            while (self._position < self._end) and self.parse():
+                pass
+        except:
+            self._flush()
+            raise
 
     def reset(self):
         """Reset internal state, including all fully or partially parsed frames.
         """
         self._frames = collections.deque()
+        self._flush()
         self._next()
 
     def _flush(self):
-        self._buffer = cStringIO.StringIO()
+        self._required = 0
+        self._position = self._end = 0
+        self._scanned = 0
+
+    def _reserve(self, size):
+        if self._position == self._end:
+            self._position = self._end = self._scanned = 0
+        if (len(self._buffer) - self._end) >= size:
+            return
+        pending = self._end - self._position
+        if (len(self._buffer) - pending) >= size: # move the unparsed tail to the front of the buffer
+            self._buffer[:pending] = self._buffer[self._position:self._end]
+            self._scanned = max(0, self._scanned - self._position)
+        else: # grow into a fresh buffer (a view obtained via reserve() might still be alive)
+            data = bytearray(max(2 * len(self._buffer), pending + size))
+            data[:pending] = buffer(self._buffer, self._position, pending)
+            self._buffer = data
+            self._scanned = max(0, self._scanned - self._position)
+        self._position, self._end = 0, pending
 
     def _next(self):
+        if self._bodyFile is not None:
+            self._bodyFile.close()
+            self._bodyFile = None
         self._frame = None
         self._length = -1
-        self._read = 0
         self._transition('heart-beat')
 
     def _append(self):
@@ -91,61 +176,188 @@ class StompParser(object):
         self._next()
 
     def _transition(self, state):
-        self._flush()
         self.parse = self._parsers[state]
 
-    def _parseHeartBeat(self, character):
-        if character != StompSpec.LINE_DELIMITER:
-            self._transition('command')
-            self.parse(character)
-            return
+    def _readLine(self):
+        end = self._buffer.find(StompSpec.LINE_DELIMITER, self._position, self._end)
+        if self.maxLineLength is not None:
+            self._checkLineLength(((self._end if (end == -1) else end) - self._position))
+        if end == -1:
+            return None
+        line = buffer(self._buffer, self._position, end - self._position)
+        self._position = end + 1
+        return line
 
-        if self.version != StompSpec.VERSION_1_0:
-            self._frame = StompHeartBeat()
-            self._append()
+    def _parseHeartBeat(self):
+        start = self._position
+        while (self._position < self._end) and self._buffer.startswith(StompSpec.LINE_DELIMITER, self._position):
+            self._position += 1
+        if (self._position > start) and (self.version != StompSpec.VERSION_1_0):
+            frames = self._frames
+            if not (frames and (frames[-1] is self._heartBeat)): # collapse a run of heart-beats
+                frames.append(self._heartBeat)
+        if self._position < self._end:
+            self._transition('command')
+        return True
 
-    def _parseCommand(self, character):
-        if character != StompSpec.LINE_DELIMITER:
-            self._buffer.write(character)
-            return
-        command = self._decode(self._buffer.getvalue())
-        if command not in StompSpec.COMMANDS[self.version]:
-            self._raise('Invalid command: %s' % repr(command))
-        self._frame = StompFrame(command=command, rawHeaders=[], version=self.version)
+    def _parseCommand(self):
+        line = self._readLine()
+        if line is None:
+            return False
+        try:
+            command = self._commands[str(line)]
+        except KeyError:
+            if not self.trusted:
+                self._raise('Invalid command: %s' % repr(self._decode(line)))
+            command = self._decode(line)
+        if self.lazy:
+            self._frame = StompLazyFrame(command=command, version=self.version)
+        else:
+            self._frame = StompFrame(command=command, version=self.version)
+            self._rawHeaders = []
+            self._decodeHeader = headerDecoder(self.version, command)
         self._transition('headers')
+        return True
 
-    def _parseHeader(self, character):
-        if character != StompSpec.LINE_DELIMITER:
-            self._buffer.write(character)
-            return
-        header = self._decode(self._buffer.getvalue())
+    def _parseHeader(self):
+        line = self._readLine()
+        if line is None:
+            return False
+        header = self._decodeHeader(str(line))
         if header:
-            try:
-                name, value = header.split(StompSpec.HEADER_SEPARATOR, 1)
-            except ValueError:
-                self._raise('No separator in header line: %s' % header)
-            header = tuple(map(self._unescape, (name, value)))
-            self._frame.rawHeaders.append(header)
-            self._transition('headers')
+            if (self.maxHeaders is not None) and (len(self._rawHeaders) >= self.maxHeaders):
+                self._raiseLimit('Too many headers [maxHeaders=%d]' % self.maxHeaders)
+            self._rawHeaders.append(header)
+        else:
+            self._frame.rawHeaders = self._rawHeaders
+            self._beginBody(int(self._frame.rawHeaders.headers.get(StompSpec.CONTENT_LENGTH_HEADER, -1)))
+        return True
+
+    def _parseHeaderBlock(self):
+        end = -1
+        start = max(self._position, self._scanned)
+        for delimiter in self._headerBlockDelimiters:
+            if self._buffer.startswith(delimiter[1:], self._position, self._end): # empty header block
+                end, size = self._position, len(delimiter) - 1
+                break
+            _end = self._buffer.find(delimiter, start, self._end)
+            if (_end != -1) and ((end == -1) or (_end < end)):
+                end, size = _end, len(delimiter)
+        if (self.maxLineLength is not None) or (self.maxHeaders is not None):
+            self._checkHeaderBlock(self._end if (end == -1) else end, complete=(end != -1))
+        if end == -1:
+            self._scanned = max(start, self._end - max(map(len, self._headerBlockDelimiters)) + 1) # a delimiter might straddle the next chunk
+            return False
+        headerBlock = str(buffer(self._buffer, self._position, end - self._position))
+        self._frame.headerBlock = headerBlock
+        self._position = end + size
+        self._beginBody(self._contentLength(headerBlock))
+        return True
+
+    def _checkHeaderBlock(self, end, complete):
+        lines = str(buffer(self._buffer, self._position, end - self._position)).split(StompSpec.LINE_DELIMITER)
+        if self.maxLineLength is not None:
+            self._checkLineLength(max(map(len, lines)))
+        headers = len(lines) if complete else (len(lines) - 1) # the last line is not complete yet
+        if (self.maxHeaders is not None) and (headers > self.maxHeaders):
+            self._raiseLimit('Too many headers [maxHeaders=%d]' % self.maxHeaders)
+
+    def _checkLineLength(self, length):
+        if length > self.maxLineLength:
+            self._raiseLimit('Line too long [maxLineLength=%d]' % self.maxLineLength)
+
+    def _contentLength(self, headerBlock):
+        prefix = self._CONTENT_LENGTH_PREFIX
+        if headerBlock.startswith(prefix):
+            start = 0
+        else:
+            start = headerBlock.find(StompSpec.LINE_DELIMITER + prefix)
+            if start == -1:
+                return -1
+            start += 1
+        start += len(prefix)
+        end = headerBlock.find(StompSpec.LINE_DELIMITER, start)
+        return int(headerBlock[start:] if (end == -1) else headerBlock[start:end])
+
+    def _beginBody(self, length):
+        if (self.maxBodySize is not None) and (length > self.maxBodySize):
+            self._raiseLimit('Body too large [content-length=%d, maxBodySize=%d]' % (length, self.maxBodySize))
+        self._length = length
+        self._scanned = 0
+        if (self.spillSize is not None) and (length > self.spillSize):
+            self._beginSpilledBody()
         else:
-            self._length = int(self._frame.headers.get(StompSpec.CONTENT_LENGTH_HEADER, -1))
             self._transition('body')
 
-    def _parseBody(self, character):
-        self._read += 1
-        if (self._read <= self._length) or (character != StompSpec.FRAME_DELIMITER):
-            self._buffer.write(character)
-            return
-        self._frame.body = self._buffer.getvalue()
+    def _parseBody(self):
+        if self._length < 0:
+            end = self._buffer.find(StompSpec.FRAME_DELIMITER, max(self._position, self._scanned), self._end)
+        else:
+            # the first content-length bytes belong to the body, no matter what they are
+            end = self._position + self._length
+            if end >= self._end:
+                self._required = self._length + 1 # don't bother before the whole body has arrived
+                return False
+            if not self._buffer.startswith(StompSpec.FRAME_DELIMITER, end):
+                end = self._buffer.find(StompSpec.FRAME_DELIMITER, max(end, self._scanned), self._end)
+        size = (self._end if (end == -1) else end) - self._position
+        if (self.maxBodySize is not None) and (size > self.maxBodySize):
+            self._raiseLimit('Body too large [maxBodySize=%d]' % self.maxBodySize)
+        if (self.spillSize is not None) and (size > self.spillSize):
+            self._length = max(self._length, 0)
+            self._beginSpilledBody()
+            return True
+        if end == -1:
+            self._scanned = self._end # resume the search for the frame delimiter here when the next chunk arrives
+            return False
+        body = str(buffer(self._buffer, self._position, end - self._position))
+        self._position = end + 1
+        self._endBody(body)
+        return True
+
+    def _beginSpilledBody(self):
+        self._bodyFile = tempfile.TemporaryFile()
+        self._bodySize = 0
+        self._transition('spilled body')
+
+    def _parseSpilledBody(self):
+        if self._length > 0: # the first content-length bytes belong to the body, no matter what they are
+            size = min(self._length, self._end - self._position)
+            self._spill(self._position + size)
+            self._length -= size
+            if self._length:
+                return False
+        end = self._buffer.find(StompSpec.FRAME_DELIMITER, self._position, self._end)
+        self._spill(self._end if (end == -1) else end)
+        if end == -1:
+            return False
+        self._position = end + 1
+        self._bodyFile.flush()
+        body = mmap.mmap(self._bodyFile.fileno(), 0, access=mmap.ACCESS_READ) if self._bodySize else ''
+        self._endBody(body)
+        return True
+
+    def _spill(self, end):
+        self._bodySize += end - self._position
+        if (self.maxBodySize is not None) and (self._bodySize > self.maxBodySize):
+            self._raiseLimit('Body too large [maxBodySize=%d]' % self.maxBodySize)
+        self._bodyFile.write(buffer(self._buffer, self._position, end - self._position))
+        self._position = end
+
+    def _endBody(self, body):
         command = self._frame.command
-        if self._frame.body and (command not in StompSpec.COMMANDS_BODY_ALLOWED.get(self.version, [command])):
+        if body and (not self.trusted) and (command not in StompSpec.COMMANDS_BODY_ALLOWED.get(self.version, [command])):
             self._raise('No body allowed for this command: %s' % command)
+        self._frame.body = body
         self._append()
 
     def _raise(self, message):
-        self._flush()
         raise StompFrameError(message)
 
+    def _raiseLimit(self, message):
+        self._next() # the rest of this frame is garbage
+        self._raise(message)
+
     def _decode(self, data):
         text = StompSpec.CODECS[self.version].decode(data)[0]
         stripLineDelimiter = StompSpec.STRIP_LINE_DELIMITER.get(self.version, '')
@@ -153,12 +365,6 @@ class StompParser(object):
             return text[:-1]
         return text
 
-    def _unescape(self, text):
-        try:
-            return unescape(self.version)(self._frame.command, text)
-        except KeyError as e:
-            raise StompFrameError('No escape sequence defined for this character: %s [text=%s]' % (e, repr(text)))
-
     @property
     def version(self):
         return self._version
@@ -166,3 +372,22 @@ class StompParser(object):
     @version.setter
     def version(self, value):
         self._version = StompSpec.version(value)
+        self._commands = _commands(self._version)
+        self._heartBeat = StompHeartBeat()
+        self._heartBeat.version = self._version
+        stripLineDelimiter = StompSpec.STRIP_LINE_DELIMITER.get(self._version, '')
+        self._headerBlockDelimiters = [StompSpec.LINE_DELIMITER + d + StompSpec.LINE_DELIMITER for d in set(['', stripLineDelimiter])]
+
+def _commands(version):
+    """A lookup table from the wire-level representation of all valid commands (with or without stripped line delimiter) to the corresponding :class:`~.StompSpec` constants, so that all parsed frames share them."""
+    try:
+        return _COMMANDS[version]
+    except KeyError:
+        encode = StompSpec.CODECS[version].encode
+        stripLineDelimiter = StompSpec.STRIP_LINE_DELIMITER.get(version, '')
+        return _COMMANDS.setdefault(version, dict(
+            ('%s%s' % (encode(command)[0], suffix), command)
+            for command in StompSpec.COMMANDS[version] for suffix in set(['', stripLineDelimiter])
+        ))
+
+_COMMANDS = {}
@@ -37,6 +37,7 @@ class StompSession(object):
 
     :param version: The highest (and at the same time default) STOMP protocol version.
     :param check: This flag decides whether the session should accept commands only in the proper session states (:obj:`True`) or in any session state (:obj:`False`).
+    :param trusted: This flag decides whether incoming **MESSAGE** and **RECEIPT** frames are checked for a valid command and for their mandatory headers (:obj:`False`) or trusted to be valid (:obj:`True`). The **CONNECTED** frame is always checked, and so is the session state (see **check**).
 
     """
     CONNECTING = 'connecting'
@@ -44,9 +45,10 @@ class StompSession(object):
     DISCONNECTING = 'disconnecting'
     DISCONNECTED = 'disconnected'
 
-    def __init__(self, version=None, check=True):
+    def __init__(self, version=None, check=True, trusted=False):
         self.version = version
         self._check = check
+        self._trusted = trusted
         self._nextSubscription = itertools.count().next
         self._reset()
         self._flush()
@@ -142,14 +144,14 @@ class StompSession(object):
     def ack(self, frame, receipt=None):
         """Create an **ACK** frame for a received **MESSAGE** frame."""
         self.__check('ack', [self.CONNECTED])
-        frame = commands.ack(frame, self._transactions, receipt)
+        frame = commands.ack(frame, self._transactions, receipt, self._trusted)
         self._receipt(receipt)
         return frame
 
     def nack(self, frame, receipt=None):
         """Create a **NACK** frame for a received **MESSAGE** frame."""
         self.__check('nack', [self.CONNECTED])
-        frame = commands.nack(frame, self._transactions, receipt)
+        frame = commands.nack(frame, self._transactions, receipt, self._trusted)
         self._receipt(receipt)
         return frame
 
@@ -222,7 +224,7 @@ class StompSession(object):
         .. seealso :: The :meth:`subscribe` method.
         """
         self.__check('message', [self.CONNECTED])
-        token = commands.message(frame)
+        token = commands.message(frame, self._trusted)
         if token not in self._subscriptions:
             raise StompProtocolError('No such subscription [%s=%s]' % token)
         return token
@@ -230,7 +232,7 @@ class StompSession(object):
     def receipt(self, frame):
         """Handle a **RECEIPT** frame. Returns the receipt id which you can use to match this receipt to the command that requested it."""
         self.__check('receipt', [self.CONNECTED, self.DISCONNECTING])
-        receipt = commands.receipt(frame)
+        receipt = commands.receipt(frame, self._trusted)
         try:
             self._receipts.remove(receipt)
         except KeyError:
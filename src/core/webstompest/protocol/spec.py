@@ -105,6 +105,13 @@ class StompSpec(object):
     TRANSACTION_HEADER = u'transaction'
     VERSION_HEADER = u'version'
 
+    HEADERS = set([
+        ACCEPT_VERSION_HEADER, ACK_HEADER, CONTENT_LENGTH_HEADER, CONTENT_TYPE_HEADER, DESTINATION_HEADER,
+        HEART_BEAT_HEADER, HOST_HEADER, ID_HEADER, LOGIN_HEADER, MESSAGE_ID_HEADER, PASSCODE_HEADER,
+        RECEIPT_HEADER, RECEIPT_ID_HEADER, SELECTOR_HEADER, SESSION_HEADER, SERVER_HEADER,
+        SUBSCRIPTION_HEADER, TRANSACTION_HEADER, VERSION_HEADER
+    ])
+
     ACK_AUTO = u'auto'
     ACK_CLIENT = u'client'
     ACK_CLIENT_INDIVIDUAL = u'client-individual'
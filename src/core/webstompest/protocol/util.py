@@ -1,4 +1,4 @@
-import re
+from webstompest.error import StompFrameError
 
 from .spec import StompSpec
 
@@ -8,6 +8,14 @@ def escape(version):
 def unescape(version):
     return _HeadersUnescaper.get(version)
 
+def headerEncoder(version, command):
+    """The (cached) transformation of a header name or value to its wire-level representation (escaped and encoded according to the STOMP protocol version) in the context of a STOMP command."""
+    return _HeaderEncoder.get(version, command)
+
+def headerDecoder(version, command):
+    """The (cached) transformation of a wire-level header line to its (name, value) pair (decoded and unescaped according to the STOMP protocol version), or to :obj:`None` (empty line) in the context of a STOMP command."""
+    return _HeaderDecoder.get(version, command)
+
 class _HeadersTransformer(object):
     _ESCAPE_CHARACTER = StompSpec.ESCAPE_CHARACTER
 
@@ -21,35 +29,163 @@ class _HeadersTransformer(object):
     def __init__(self, version):
         self.excludedCommands = StompSpec.COMMANDS_ESCAPE_EXCLUDED[version]
         self.escapeSequences = self._escapeSequences(version)
-        self.regex = re.compile(self._regex)
-
-    def __call__(self, command, text):
-        if command in self.excludedCommands:
-            return text
-        return self.regex.sub(self._sub, text)
 
     def _escapedCharacters(self, version):
         return StompSpec.ESCAPED_CHARACTERS[version]
 
-    def _sub(self, match):
-        return self.escapeSequences[match.group(1)]
-
 class _HeadersEscaper(_HeadersTransformer):
     _INSTANCES = {} # each class needs its own instance cache
 
+    def __init__(self, version):
+        super(_HeadersEscaper, self).__init__(version)
+        # the escape character has to be escaped first
+        self._replacements = sorted(self.escapeSequences.iteritems(), key=lambda (character, _): character != self._ESCAPE_CHARACTER)
+
+    def __call__(self, command, text):
+        if command in self.excludedCommands:
+            return text
+        for (character, _) in self._replacements:
+            if character in text:
+                break
+        else: # nothing to escape (the common case)
+            return text
+        for (character, escapeSequence) in self._replacements:
+            text = text.replace(character, escapeSequence)
+        return text
+
     def _escapeSequences(self, version):
         return dict((escapeSequence, '%s%s' % (self._ESCAPE_CHARACTER, character)) for (character, escapeSequence) in self._escapedCharacters(version).iteritems())
 
-    @property
-    def _regex(self):
-        return '(%s)' % '|'.join(map(re.escape, self.escapeSequences))
-
 class _HeadersUnescaper(_HeadersTransformer):
     _INSTANCES = {} # each class needs its own instance cache
 
+    def __init__(self, version):
+        super(_HeadersUnescaper, self).__init__(version)
+        escapeCharacter = self._ESCAPE_CHARACTER
+        self._replacements = [('%s%s' % (escapeCharacter, character), escapeSequence) for (character, escapeSequence) in self.escapeSequences.iteritems() if character != escapeCharacter]
+
+    def __call__(self, command, text):
+        escapeCharacter = self._ESCAPE_CHARACTER
+        if (escapeCharacter not in text) or (command in self.excludedCommands): # nothing to unescape (the common case)
+            return text
+        chunks = text.split(2 * escapeCharacter) # the remaining escape characters all start other escape sequences
+        for (index, chunk) in enumerate(chunks):
+            if escapeCharacter not in chunk:
+                continue
+            for (escapeSequence, character) in self._replacements:
+                chunk = chunk.replace(escapeSequence, character)
+            self._check(chunk)
+            chunks[index] = chunk
+        return escapeCharacter.join(chunks)
+
+    def _check(self, text):
+        position = text.find(self._ESCAPE_CHARACTER)
+        while position != -1:
+            character = text[position + 1:position + 2]
+            if character not in ('', '\n'): # a trailing or line-breaking escape character is no escape sequence
+                raise KeyError(character)
+            position = text.find(self._ESCAPE_CHARACTER, position + 1)
+
     def _escapeSequences(self, version):
         return self._escapedCharacters(version)
 
-    @property
-    def _regex(self):
-        return '%s(.)' % re.escape(self._ESCAPE_CHARACTER)
+def _headerNames(version):
+    """A lookup table from the wire-level representation of the standard header names to the corresponding :class:`~.StompSpec` constants, so that all parsed frames share them."""
+    try:
+        return _HEADER_NAMES[version]
+    except KeyError:
+        encode = StompSpec.CODECS[version].encode
+        return _HEADER_NAMES.setdefault(version, dict((encode(name)[0], name) for name in StompSpec.HEADERS))
+
+_HEADER_NAMES = {}
+
+class _HeaderCache(object):
+    """A size-bounded cache which keeps the recently used entries. It consists of two generations: Hits in the old generation are promoted to the current one, and once the current generation is full, it replaces the old one. This keeps the cost of a hit down to a single :class:`dict` lookup."""
+    SIZE = 1024 # entries per version and command
+    MAX_LENGTH = 256 # longer texts are transformed but not cached
+
+    @classmethod
+    def get(cls, version, command):
+        try:
+            return cls._INSTANCES[(version, command)]
+        except KeyError:
+            return cls._INSTANCES.setdefault((version, command), cls(version, command))
+
+    def __init__(self, version, command):
+        self.version = version
+        self.command = command
+        self.hits = self.misses = 0
+        self._current = {}
+        self._old = {}
+
+    def __call__(self, text):
+        try:
+            value = self._current[text]
+        except (KeyError, TypeError):
+            return self._miss(text)
+        self.hits += 1
+        return value
+
+    def __len__(self):
+        return len(self._current) + len(self._old)
+
+    def clear(self):
+        self.hits = self.misses = 0
+        self._current = {}
+        self._old = {}
+
+    def _miss(self, text):
+        if not (isinstance(text, basestring) and (len(text) <= self.MAX_LENGTH)):
+            return self._transform(text)
+        try:
+            value = self._old.pop(text)
+        except KeyError:
+            self.misses += 1
+            value = self._transform(text)
+        else:
+            self.hits += 1
+        if (2 * len(self._current)) >= self.SIZE:
+            self._old, self._current = self._current, {}
+        self._current[text] = value
+        return value
+
+class _HeaderEncoder(_HeaderCache):
+    _INSTANCES = {} # each class needs its own instance cache
+
+    def __init__(self, version, command):
+        super(_HeaderEncoder, self).__init__(version, command)
+        self._escape = escape(version)
+        self._encode = StompSpec.CODECS[version].encode
+
+    def _transform(self, text):
+        return self._encode(self._escape(self.command, unicode(text)))[0]
+
+class _HeaderDecoder(_HeaderCache):
+    _INSTANCES = {} # each class needs its own instance cache
+
+    def __init__(self, version, command):
+        super(_HeaderDecoder, self).__init__(version, command)
+        self._unescape = unescape(version)
+        self._decode = StompSpec.CODECS[version].decode
+        self._stripLineDelimiter = StompSpec.STRIP_LINE_DELIMITER.get(version, '')
+        self._names = _headerNames(version)
+
+    def _transform(self, line):
+        if self._stripLineDelimiter and line.endswith(self._stripLineDelimiter):
+            line = line[:-1]
+        if not line:
+            return None
+        name, separator, value = line.partition(StompSpec.HEADER_SEPARATOR) # the separator cannot be part of a multi-byte character
+        if not separator:
+            raise StompFrameError('No separator in header line: %s' % self._decode(line)[0])
+        try:
+            name = self._names[name]
+        except KeyError:
+            name = self._unescapeText(self._decode(name)[0])
+        return (name, self._unescapeText(self._decode(value)[0]))
+
+    def _unescapeText(self, text):
+        try:
+            return self._unescape(self.command, text)
+        except KeyError as e:
+            raise StompFrameError('No escape sequence defined for this character: %s [text=%s]' % (e, repr(text)))
@@ -1 +1,2 @@
 from client import Stomp
+from selector import StompSelector
@@ -26,7 +26,7 @@ import time
 
 from webstompest.error import StompConnectionError, StompProtocolError
 from webstompest.protocol import StompFailoverTransport, StompSession
-from webstompest.util import checkattr
+from webstompest.util import checkattr, socketOptions
 
 from .transport import StompFrameTransport, StompFrameOverWebSocketTransport
 
@@ -47,21 +47,27 @@ class Stomp(object):
         for session state, :mod:`.protocol.commands` for all API options which are documented here.
     """
     _failoverFactory = StompFailoverTransport
+    _transportFactory = StompFrameTransport
+    _webSocketTransportFactory = StompFrameOverWebSocketTransport
 
-    def _transportFactorySelector(broker):
+    HEART_BEAT_TOLERANCE = 2.0 # the server heart-beat is overdue if nothing was received for this many server heart-beat periods
+
+    def _transportFactorySelector(self, broker):
         protocol = broker['protocol']
         host = broker['host']
         port = broker['port']
+        config = self._config
+        options = {'lazyHeaders': config.lazyHeaders, 'maxLineLength': config.maxLineLength, 'maxHeaders': config.maxHeaders, 'maxBodySize': config.maxBodySize, 'spillSize': config.spillSize, 'trusted': config.trusted}
         if protocol == 'wss' or protocol == 'ws':
             path = broker['path']
-            return StompFrameOverWebSocketTransport(host, port, path=path, protocol=protocol)
+            return self._webSocketTransportFactory(host, port, path=path, protocol=protocol, **options)
         else:
-            return StompFrameTransport(host, port)
+            return self._transportFactory(host, port, readSize=config.readSize, maxReadSize=config.maxReadSize, writeBufferSize=config.writeBufferSize, maxWriteDelay=config.maxWriteDelay, socketOptions=socketOptions(config, self._failover.socketOptions), **options)
 
     def __init__(self, config):
         self.log = logging.getLogger(LOG_CATEGORY)
         self._config = config
-        self._session = StompSession(self._config.version, self._config.check)
+        self._session = StompSession(self._config.version, self._config.check, self._config.trusted)
         self._failover = self._failoverFactory(config.uri)
         self._transport = None
 
@@ -140,6 +146,7 @@ class Stomp(object):
                 'STOMP session connect failed [timeout=%s]' % timeout)
         frame = self.receiveFrame()
         self.session.connected(frame)
+        self._heartBeatTimeout = self.HEART_BEAT_TOLERANCE * self.session.serverHeartBeat / 1000.0
         self.log.info('Connected to stomp broker [session=%s, version=%s]' % (
             self.session.id, self.session.version))
         self._transport.setVersion(self.session.version)
@@ -227,6 +234,27 @@ class Stomp(object):
         """
         self.sendFrame(self.session.commit(transaction, receipt))
 
+    @contextlib.contextmanager
+    @connected
+    def batch(self):
+        """batch()
+
+        A context manager which holds back all frames you send within the :obj:`with` block, and writes them to the wire-level connection in one piece when you leave the block (or before the client waits for incoming frames). Large frames are held back, too; their bodies are then written as they are, without copying them into that piece. Blocks may be nested; only the outermost one flushes.
+
+        **Example:**
+
+        >>> with client.batch():
+        ...     for frame in frames:
+        ...         client.ack(frame)
+        ...
+        """
+        transport = self._transport
+        transport.cork()
+        try:
+            yield
+        finally:
+            transport.uncork()
+
     @contextlib.contextmanager
     @connected
     def transaction(self, transaction=None, receipt=None):
@@ -321,13 +349,7 @@ class Stomp(object):
             timeout = deadline and max(0, deadline - time.time())
             if not self._transport.canRead(timeout):
                 return False
-            frame = self._transport.receive()
-            self.session.received()
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('Received %s' % frame.info())
-            # there's a real STOMP frame on the wire, not a heart-beat
-            if frame:
-                self._messages.append(frame)
+            if self._receive(self._transport):
                 return True
 
     def sendFrame(self, frame):
@@ -350,6 +372,24 @@ class Stomp(object):
         if self.canRead():
             return self._messages.popleft()
 
+    @connected
+    def flush(self):
+        """flush()
+
+        Write all frames which have been held back (see :meth:`~.sync.client.Stomp.batch` and the **writeBufferSize** option of :class:`~.StompConfig`) to the wire-level connection.
+        """
+        self._transport.flush()
+
+    @connected
+    def fileno(self):
+        """fileno()
+
+        The file descriptor of the wire-level connection. You may wait for it to become readable (with :func:`select.select` and friends) before you call :meth:`~.sync.client.Stomp.canRead` and :meth:`~.sync.client.Stomp.receiveFrame`, or let a :class:`~.StompSelector` do that for many clients at once.
+
+        .. note :: Only the TCP transport supports this method. A reconnect will open a new file descriptor.
+        """
+        return self._transport.fileno()
+
     @property
     def session(self):
         """The :class:`~.StompSession` associated to this client.
@@ -358,11 +398,19 @@ class Stomp(object):
 
     @property
     def _transport(self):
+        # The transport knows from the outcome of its last read or write whether the connection is gone, so there is no
+        # need to probe the socket on each call. We only do so if the server heart-beat is overdue: then we pick up any
+        # pending data (or the end of the stream) to find out whether the broker has closed the connection meanwhile. The
+        # probe reads at most once, and only if the socket is readable, so it never blocks on a partially received frame.
         transport = self.__transport
         if not transport:
             raise StompConnectionError('Not connected')
         try:
-            transport.canRead(0)
+            if self._heartBeatTimeout and transport.connected and ((time.time() - self.session.lastReceived) > self._heartBeatTimeout):
+                self.log.debug('Server heart-beat is overdue: probing connection')
+                self._read(transport)
+            if not transport.connected:
+                raise StompConnectionError('Not connected')
         except Exception as e:
             self.close(flush=False)
             raise e
@@ -371,8 +419,37 @@ class Stomp(object):
     @_transport.setter
     def _transport(self, transport):
         self.__transport = transport
+        self._heartBeatTimeout = 0
         self._messages = collections.deque()
 
+    def _receive(self, transport):
+        frame = transport.receive()
+        self.session.received()
+        return self._queue(frame)
+
+    def _read(self, transport=None):
+        # queue all frames which are complete, and read once from the wire-level connection if that does not block
+        transport = transport or self._transport
+        self._drain(transport)
+        if transport.canRead(0):
+            transport.read()
+            self.session.received()
+            self._drain(transport)
+
+    def _drain(self, transport=None):
+        # queue all frames which are complete without touching the wire-level connection (see StompSelector)
+        for frame in (transport or self._transport).drain():
+            self._queue(frame)
+
+    def _queue(self, frame):
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Received %s' % frame.info())
+        # there's a real STOMP frame on the wire, not a heart-beat
+        if frame:
+            self._messages.append(frame)
+            return True
+        return False
+
     # heart-beating
 
     @connected
@@ -0,0 +1,155 @@
+"""A :class:`StompSelector` drives many synchronous clients from one thread. It waits for all of their connections at once (with :func:`select.epoll` where available, with :func:`select.poll` otherwise), so you need neither a thread per client nor busy polling of :meth:`~.sync.client.Stomp.canRead`.
+
+**Example:**
+
+>>> clients = [Stomp(StompConfig('tcp://localhost:61613', version=StompSpec.VERSION_1_1)) for _ in xrange(100)]
+>>> selector = StompSelector()
+>>> for client in clients:
+...     client.connect(heartBeats=(1000, 0))
+...     client.subscribe('/queue/test', {StompSpec.ACK_HEADER: StompSpec.ACK_CLIENT_INDIVIDUAL})
+...     selector.register(client)
+...
+>>> while selector:
+...     for (client, frame) in selector.select():
+...         if frame is None: # the connection is gone; reconnect and register the client again if you wish
+...             continue
+...         client.ack(frame)
+...
+"""
+import errno
+import logging
+import select
+import time
+
+from webstompest.error import StompConnectionError
+
+LOG_CATEGORY = __name__
+
+class StompSelector(object):
+    """Wait for incoming frames on many connected :class:`~.sync.client.Stomp` clients at once, and service their client heart-beats.
+
+    :param clients: An iterable of connected clients to :meth:`register` right away.
+
+    .. note :: The selector only knows the file descriptor a client had when you registered it. After a reconnect, you have to :meth:`register` the client again.
+    """
+    HEART_BEAT_RATIO = 0.8 # send a client heart-beat when this fraction of the negotiated client heart-beat period has passed without sending anything
+
+    def __init__(self, clients=None):
+        self.log = logging.getLogger(LOG_CATEGORY)
+        self._clients = {}
+        if hasattr(select, 'epoll'):
+            self._poller = select.epoll()
+            self._mask = select.EPOLLIN | select.EPOLLPRI
+            self._poll = lambda timeout: self._poller.poll(-1 if (timeout is None) else timeout)
+        else:
+            self._poller = select.poll()
+            self._mask = select.POLLIN | select.POLLPRI
+            self._poll = lambda timeout: self._poller.poll(None if (timeout is None) else (1000 * timeout))
+        for client in (clients or []):
+            self.register(client)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __contains__(self, client):
+        return any(client is client_ for client_ in self._clients.itervalues())
+
+    def register(self, client):
+        """Watch a client's connection.
+
+        .. note :: If the client is not connected, this method will raise a :class:`~.StompConnectionError`. If you disconnect a client yourself, :meth:`unregister` it first.
+        """
+        fileno = client.fileno()
+        self._poller.register(fileno, self._mask)
+        self._clients[fileno] = client
+
+    def unregister(self, client):
+        """Stop watching a client's connection. Unknown clients are ignored."""
+        for (fileno, client_) in self._clients.items():
+            if client_ is client:
+                self._unregister(fileno)
+
+    def close(self):
+        """Unregister all clients and release the resources of the selector (the clients remain connected)."""
+        for fileno in list(self._clients):
+            self._unregister(fileno)
+        if hasattr(self._poller, 'close'):
+            self._poller.close()
+
+    def select(self, timeout=None):
+        """select(timeout=None)
+
+        Wait until frames are available for any registered client, and iterate over them as (client, frame) pairs. If a client's connection is lost, the client is closed (its session keeps the active subscriptions for a replay) and unregistered, and you get a (client, :obj:`None`) pair.
+
+        :param timeout: The time (in seconds) to wait for frames to arrive. If :obj:`None`, we will wait until there are frames or a lost connection to report.
+
+        Before waiting, the selector writes the frames which the clients hold back (see :meth:`~.sync.client.Stomp.batch`), and while waiting, it sends client heart-beats for all clients which negotiated them. It does not wait at all if a client has frames which were received completely before. It never blocks on a connection which has no data, or only part of a frame.
+        """
+        deadline = None if (timeout is None) else (time.time() + timeout)
+        while self._clients:
+            lost = []
+            now = time.time()
+            timeout = self._service(now, lost)
+            if deadline is not None:
+                timeout = max(0, (deadline - now) if (timeout is None) else min(timeout, deadline - now))
+            if lost or any(client._messages for client in self._clients.itervalues()):
+                timeout = 0
+            for (fileno, _) in self._wait(timeout):
+                client = self._clients.get(fileno)
+                if client is None:
+                    continue
+                try:
+                    client._read()
+                except StompConnectionError as e:
+                    self._lose(fileno, client, lost, e)
+            ready = [client for client in self._clients.values() if client._messages]
+            for client in ready:
+                while client._messages:
+                    yield (client, client._messages.popleft())
+            for client in lost:
+                yield (client, None)
+            if ready or lost or ((deadline is not None) and (time.time() >= deadline)):
+                return
+
+    def _service(self, now, lost):
+        # queue complete frames, send due heart-beats and pending frames, and tell how long we may wait until the next heart-beat is due
+        timeout = None
+        for (fileno, client) in self._clients.items():
+            period = self.HEART_BEAT_RATIO * client.clientHeartBeat / 1000.0
+            due = period and (client.lastSent + period)
+            try:
+                client._drain() # the parser might hold complete frames which are not queued yet (the socket won't tell)
+                if period and (due <= now):
+                    client.beat()
+                    due = now + period
+                client.flush()
+            except StompConnectionError as e:
+                self._lose(fileno, client, lost, e)
+                continue
+            if period:
+                timeout = (due - now) if (timeout is None) else min(timeout, due - now)
+        return timeout
+
+    def _lose(self, fileno, client, lost, error):
+        self.log.warning('Lost connection [fileno=%d, error=%s]' % (fileno, error))
+        self._unregister(fileno)
+        client.close(flush=False)
+        lost.append(client)
+
+    def _unregister(self, fileno):
+        del self._clients[fileno]
+        try:
+            self._poller.unregister(fileno)
+        except (IOError, KeyError, ValueError): # the file descriptor has already been closed
+            pass
+
+    def _wait(self, timeout):
+        deadline = None if (timeout is None) else (time.time() + timeout)
+        while True:
+            try:
+                return self._poll(timeout)
+            except (IOError, select.error) as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+            if deadline is not None:
+                timeout = max(0, deadline - time.time())
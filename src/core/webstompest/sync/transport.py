@@ -8,18 +8,62 @@ import datetime
 
 from webstompest.error import StompConnectionError
 from webstompest.protocol import StompParser
+from webstompest.util import setSocketOptions
+
+def readable(socket_, timeout=None, poll=hasattr(select, 'poll')):
+    """Wait until data (or the end of the stream) is available on a socket.
+
+    :param socket_: The socket (or any object with a :meth:`fileno` method).
+    :param timeout: The time (in seconds) to wait. If :obj:`None`, we will wait indefinitely.
+    :param poll: Decides whether to use :func:`select.poll` (which copes with file descriptors beyond **FD_SETSIZE**) or :func:`select.select` (for platforms which lack :func:`select.poll`, e.g., Windows).
+
+    .. note :: An interrupted system call (**EINTR**) is retried with the remaining timeout.
+    """
+    deadline = None if (timeout is None) else (time.time() + timeout)
+    while True:
+        try:
+            if poll:
+                poller = select.poll()
+                poller.register(socket_, select.POLLIN | select.POLLPRI)
+                return bool(poller.poll(None if (timeout is None) else (1000 * timeout)))
+            if timeout is None:
+                files, _, _ = select.select([socket_], [], [])
+            else:
+                files, _, _ = select.select([socket_], [], [], timeout)
+            return bool(files)
+        except select.error as (code, _):
+            if code != errno.EINTR:
+                raise
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
 
 class StompFrameTransport(object):
     factory = StompParser
 
     READ_SIZE = 4096
+    MAX_READ_SIZE = 262144
+    JOIN_SIZE = 65536 # frames (and pieces of frames) smaller than this are joined before they are sent
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, readSize=None, maxReadSize=None, lazyHeaders=False, maxLineLength=None, maxHeaders=None, maxBodySize=None, spillSize=None, trusted=False, writeBufferSize=None, maxWriteDelay=None, socketOptions=None):
         self.host = host
         self.port = port
+        self.socketOptions = socketOptions or {}
+
+        self.minReadSize = readSize or self.READ_SIZE
+        self.maxReadSize = max(self.minReadSize, maxReadSize or self.MAX_READ_SIZE)
+        self.readSize = self.minReadSize
+        self.reads = self.frames = self.writes = 0
+
+        self.writeBufferSize = writeBufferSize
+        self.maxWriteDelay = maxWriteDelay
+        self._pending = []
+        self._pendingSize = 0
+        self._pendingSince = None
+        self._pendingLarge = False
+        self._corked = 0
 
         self._socket = None
-        self._parser = self.factory()
+        self._parser = self.factory(lazy=lazyHeaders, maxLineLength=maxLineLength, maxHeaders=maxHeaders, maxBodySize=maxBodySize, spillSize=spillSize, trusted=trusted)
 
     def __str__(self):
         return '%s:%d' % (self.host, self.port)
@@ -28,31 +72,33 @@ class StompFrameTransport(object):
         self._check()
         if self._parser.canRead():
             return True
-
-        startTime = time.time()
-        try:
-            if timeout is None:
-                files, _, _ = select.select([self._socket], [], [])
-            else:
-                files, _, _ = select.select([self._socket], [], [], timeout)
-        except select.error as (code, msg):
-            if code == errno.EINTR:
-                if timeout is None:
-                    return self.canRead()
-                else:
-                    return self.canRead(max(0, timeout - (time.time() - startTime)))
-            raise
-        return bool(files)
+        if self._pending: # the broker might be waiting for our frames before it answers
+            self.flush()
+        return readable(self._socket, timeout)
 
     def connect(self, timeout=None):
         kwargs = {} if (timeout is None) else {'timeout': timeout}
         try:
             self._socket = socket.create_connection((self.host, self.port), **kwargs)
+            setSocketOptions(self._socket, **self.socketOptions)
         except IOError as e:
+            self._socket and self._socket.close()
+            self._socket = None
             raise StompConnectionError('Could not establish connection [%s]' % e)
         self._parser.reset()
+        self._discard()
+
+    def cork(self):
+        """Hold back all frames to be sent until the matching :meth:`uncork` (calls may be nested)."""
+        self._corked += 1
 
     def disconnect(self):
+        if self._socket and self._pending:
+            try:
+                self.flush()
+            except StompConnectionError:
+                pass
+        self._discard()
         try:
             self._socket and self._socket.close()
         except IOError as e:
@@ -60,26 +106,116 @@ class StompFrameTransport(object):
         finally:
             self._socket = None
 
+    def drain(self):
+        """The frames which have been received completely so far, as a (possibly empty) :class:`list`. This method does not touch the socket."""
+        frames = self._parser.drain()
+        self.frames += len(frames)
+        return frames
+
+    def fileno(self):
+        """The file descriptor of the socket (for use with :func:`select.select` and friends)."""
+        self._check()
+        return self._socket.fileno()
+
+    def flush(self):
+        """Write all frames which have been held back so far to the socket (in one piece, except for the large bodies which are passed on as they are)."""
+        if not self._pending:
+            return
+        if self._pendingLarge:
+            chunks, run = [], []
+            for data in self._pending:
+                if len(data) < self.JOIN_SIZE:
+                    run.append(data)
+                    continue
+                if run:
+                    chunks.append(''.join(run))
+                    run = []
+                chunks.append(data)
+            if run:
+                chunks.append(''.join(run))
+        else:
+            chunks = [''.join(self._pending)]
+        self._discard()
+        self._write(*chunks)
+
+    def read(self):
+        """Read from the socket once. If :meth:`canRead` told you that the socket is readable, this method will not block."""
+        if self._pending:
+            self.flush()
+        readSize = self.readSize
+        try:
+            # read straight into the parser's receive buffer
+            size = self._socket.recv_into(self._parser.reserve(readSize), readSize)
+            if not size:
+                raise StompConnectionError('No more data')
+        except (IOError, StompConnectionError) as e:
+            self.disconnect()
+            raise StompConnectionError('Connection closed [%s]' % e)
+        self.reads += 1
+        self._adaptReadSize(size)
+        self._parser.commit(size)
+        if self.socketOptions.get('quickAck'): # the kernel falls back to delayed ACKs after a while
+            setSocketOptions(self._socket, quickAck=True)
+
     def receive(self):
         while True:
             frame = self._parser.get()
             if frame is not None:
+                self.frames += 1
                 return frame
-            try:
-                data = self._socket.recv(self.READ_SIZE)
-                if not data:
-                    raise StompConnectionError('No more data')
-            except (IOError, StompConnectionError) as e:
-                self.disconnect()
-                raise StompConnectionError('Connection closed [%s]' % e)
-            self._parser.add(data)
+            self.read()
+
+    @property
+    def readsPerFrame(self):
+        """The average number of socket reads per received frame (heart-beats included)."""
+        return float(self.reads) / self.frames if self.frames else 0.0
+
+    def _adaptReadSize(self, size):
+        if size == self.readSize: # there is probably more data waiting
+            self.readSize = min(2 * self.readSize, self.maxReadSize)
+        elif (2 * size) < self.readSize: # the socket is drained
+            self.readSize = max(self.readSize // 2, self.minReadSize)
 
     def send(self, frame):
-        self._write(str(frame))
+        buffers = frame.buffers()
+        size = sum(map(len, buffers))
+        if size >= self.JOIN_SIZE: # large bodies are passed on as they are
+            if len(buffers) > 2: # a lone frame delimiter would be a tiny write of its own which Nagle's algorithm may hold back
+                buffers = [buffers[0], buffers[1] + buffers[2]]
+            if not self._corked:
+                self.flush()
+                self._write(*buffers)
+                return
+            pieces = [piece if (len(piece) >= self.JOIN_SIZE) else str(piece) for piece in buffers]
+            self._pendingLarge = True
+        else:
+            data = ''.join(map(str, buffers))
+            if not (self._corked or self.writeBufferSize):
+                self._write(data)
+                return
+            pieces = [data]
+        self._check()
+        if not self._pending:
+            self._pendingSince = time.time()
+        self._pending.extend(pieces)
+        self._pendingSize += size
+        if not self._corked and ((self._pendingSize >= self.writeBufferSize) or ((self.maxWriteDelay is not None) and ((time.time() - self._pendingSince) >= self.maxWriteDelay))):
+            self.flush()
 
     def setVersion(self, version):
         self._parser.version = version
 
+    @property
+    def connected(self):
+        """Whether the wire-level connection is still up, as far as we know from the outcome of the last read or write (this does not touch the socket)."""
+        return self._connected()
+
+    def uncork(self):
+        """Undo a :meth:`cork`, and :meth:`flush` if there is no other :meth:`cork` in effect."""
+        self._corked = max(0, self._corked - 1)
+        if not self._corked:
+            self.flush()
+
     def _check(self):
         if not self._connected():
             raise StompConnectionError('Not connected')
@@ -87,11 +223,20 @@ class StompFrameTransport(object):
     def _connected(self):
         return self._socket is not None
 
-    def _write(self, data):
+    def _discard(self):
+        self._pending = []
+        self._pendingSize = 0
+        self._pendingSince = None
+        self._pendingLarge = False
+
+    def _write(self, *buffers):
         self._check()
         try:
-            self._socket.sendall(data)
+            for data in buffers:
+                self._socket.sendall(data)
+                self.writes += 1
         except IOError as e:
+            self.disconnect()
             raise StompConnectionError('Could not send to connection [%s]' % e)
 
 
@@ -147,7 +292,7 @@ class StompFrameOverWebSocketTransport(object):
 
     READ_SIZE = 4096
 
-    def __init__(self, host, port, path='/', protocol='wss'):
+    def __init__(self, host, port, path='/', protocol='wss', lazyHeaders=False, maxLineLength=None, maxHeaders=None, maxBodySize=None, spillSize=None, trusted=False):
         self.host = host
         self.port = port
         self.path = path
@@ -155,7 +300,7 @@ class StompFrameOverWebSocketTransport(object):
         self.client = self.wsc("{}://{}:{}".format(self.protocol, self.host, self.port))
         self.client.resource = self.path
         self._socket = None
-        self._parser = self.factory()
+        self._parser = self.factory(lazy=lazyHeaders, maxLineLength=maxLineLength, maxHeaders=maxHeaders, maxBodySize=maxBodySize, spillSize=spillSize, trusted=trusted)
 
     def __str__(self):
         return '%s://%s:%d%s' % (self.protocol, self.host, self.port, self.path)
@@ -164,21 +309,7 @@ class StompFrameOverWebSocketTransport(object):
         self._check()
         if self._parser.canRead():
             return True
-
-        startTime = time.time()
-        try:
-            if timeout is None:
-                files, _, _ = select.select([self._socket], [], [])
-            else:
-                files, _, _ = select.select([self._socket], [], [], timeout)
-        except select.error as (code, msg):
-            if code == errno.EINTR:
-                if timeout is None:
-                    return self.canRead()
-                else:
-                    return self.canRead(max(0, timeout - (time.time() - startTime)))
-            raise
-        return bool(files)
+        return readable(self._socket, timeout)
 
     def connect(self, timeout=None):
         # kwargs = {} if (timeout is None) else {'timeout': timeout}
@@ -202,14 +333,26 @@ class StompFrameOverWebSocketTransport(object):
             frame = self._parser.get()
             if frame is not None:
                 return frame
-            try:
-                data = self.client.message()
-                if not data:
-                    raise StompConnectionError('No more data')
-            except (IOError, StompConnectionError) as e:
-                self.disconnect()
-                raise StompConnectionError('Connection closed [%s]' % e)
-            self._parser.add(data)
+            self.read()
+
+    def drain(self):
+        return self._parser.drain()
+
+    def read(self):
+        try:
+            data = self.client.message()
+            if not data:
+                raise StompConnectionError('No more data')
+        except (IOError, StompConnectionError) as e:
+            self.disconnect()
+            raise StompConnectionError('Connection closed [%s]' % e)
+        self._parser.add(data)
+
+    def cork(self):
+        pass # frames are handed to the WebSocket client one by one
+
+    def flush(self):
+        pass
 
     def send(self, frame):
         self._write(str(frame))
@@ -217,19 +360,28 @@ class StompFrameOverWebSocketTransport(object):
     def send_binary(self, frame):
         self._write(frame, binary=True)
 
+    def uncork(self):
+        pass
+
     def setVersion(self, version):
         self._parser.version = version
 
+    @property
+    def connected(self):
+        """Whether the WebSocket connection is still up, as far as we know from its last pong and the outcome of the last read or write."""
+        return self._connected()
+
     def _check(self):
         if not self._connected():
             raise StompConnectionError('Not connected')
 
     def _connected(self):
-        return self.client.am_i_alive()
+        return (self.client is not None) and self.client.am_i_alive()
 
     def _write(self, data, binary=False):
         self._check()
         try:
             self.client.send(data, binary=binary)
         except IOError as e:
+            self.disconnect()
             raise StompConnectionError('Could not send to connection [%s]' % e)
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from webstompest import benchmarks
+from webstompest.protocol import StompSpec
+
+class BenchmarksTest(unittest.TestCase):
+    def test_run_and_compare(self):
+        results = benchmarks.run(versions=[StompSpec.VERSION_1_1], pattern='small', minTime=0.001, repeat=1)
+        self.assertEquals(sorted(results['results']), ['parse-split/small/1.1', 'parse/small/1.1', 'render/small/1.1'])
+        for result in results['results'].itervalues():
+            self.assertTrue(result['frames'] > 0)
+            self.assertAlmostEquals(result['bytesPerSecond'], result['framesPerSecond'] * result['frameSize'])
+        results = json.loads(json.dumps(results))
+        comparison = benchmarks.compare(results, results)
+        self.assertEquals([key for (key, _, _, _) in comparison], sorted(results['results']))
+        self.assertEquals(set(speedup for (_, _, _, speedup) in comparison), set([1.0]))
+        self.assertEquals(benchmarks.compare(results, {'results': {}}), [])
+
+    def test_heart_beats(self):
+        for version in StompSpec.VERSIONS:
+            names = [name for (name, _, _, _) in benchmarks.benchmarks(version)]
+            self.assertEquals('heart-beats' in names, version != StompSpec.VERSION_1_0)
+
+    def test_escape(self):
+        results = benchmarks.run(versions=[StompSpec.VERSION_1_2], pattern='escape', minTime=0.001, repeat=1)
+        self.assertEquals(sorted(results['results']), ['escape/escaped-text/1.2', 'escape/plain-text/1.2', 'unescape/escaped-text/1.2', 'unescape/plain-text/1.2'])
+
+    def test_receive_ack(self):
+        for version in StompSpec.VERSIONS:
+            results = benchmarks.run(versions=[version], pattern='receive-ack', minTime=0.001, repeat=1)
+            self.assertEquals(sorted(results['results']), ['receive-ack-trusted/message/%s' % version, 'receive-ack/message/%s' % version])
+
+    def test_send(self):
+        results = benchmarks.run(versions=[StompSpec.VERSION_1_2], pattern='send', minTime=0.001, repeat=1)
+        self.assertEquals(sorted(results['results']), ['send-batch/outgoing/1.2', 'send/outgoing/1.2'])
+
+    def test_main(self):
+        (fd, path) = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            benchmarks.main(['--output', path, '--version', StompSpec.VERSION_1_2, '--pattern', 'heart-beats', '--min-time', '0.001', '--repeat', '1', '--compare', path])
+            with open(path) as f:
+                self.assertEquals(list(json.load(f)['results']), ['heart-beats/heart-beat/1.2'])
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import itertools
+import re
+import unittest
+
+from webstompest.error import StompFrameError
+from webstompest.protocol import StompSpec
+from webstompest.protocol.util import escape, headerDecoder, headerEncoder, unescape
+
+class EscapeTest(unittest.TestCase):
+    TEXTS = [
+        u'', u'/queue/test', u'ID:host-61616-1-1:0:1:1:1', u'fen\xeatre', '\\', ':', '\n', '\r', '\\\n', 'a\\',
+        u'\\n\\\\:\\c\t\\r', u'\n\\:\t\r\n', 'there\rfolks', 'with:colon'
+    ]
+
+    def _referenceEscape(self, version):
+        escapeSequences = dict((escapeSequence, '%s%s' % (StompSpec.ESCAPE_CHARACTER, character)) for (character, escapeSequence) in StompSpec.ESCAPED_CHARACTERS[version].iteritems())
+        regex = re.compile('(%s)' % '|'.join(map(re.escape, escapeSequences)))
+        return lambda text: regex.sub(lambda match: escapeSequences[match.group(1)], text)
+
+    def _referenceUnescape(self, version):
+        escapeSequences = StompSpec.ESCAPED_CHARACTERS[version]
+        regex = re.compile('%s(.)' % re.escape(StompSpec.ESCAPE_CHARACTER))
+        return lambda text: regex.sub(lambda match: escapeSequences[match.group(1)], text)
+
+    def test_escape(self):
+        for version in StompSpec.VERSIONS:
+            for text in self.TEXTS:
+                for command in (StompSpec.SEND, StompSpec.CONNECT):
+                    expected = text if (command in StompSpec.COMMANDS_ESCAPE_EXCLUDED[version]) else self._referenceEscape(version)(text)
+                    self.assertEquals(escape(version)(command, text), expected)
+        self.assertEquals(escape(StompSpec.VERSION_1_2)(StompSpec.SEND, u'\n\\:\t\r'), u'\\n\\\\\\c\t\\r')
+
+    def test_unescape(self):
+        for version in StompSpec.VERSIONS:
+            for text in self.TEXTS:
+                for command in (StompSpec.MESSAGE, StompSpec.CONNECTED):
+                    try:
+                        expected = text if (command in StompSpec.COMMANDS_ESCAPE_EXCLUDED[version]) else self._referenceUnescape(version)(text)
+                    except KeyError:
+                        self.assertRaises(KeyError, unescape(version), command, text)
+                    else:
+                        self.assertEquals(unescape(version)(command, text), expected)
+        self.assertEquals(unescape(StompSpec.VERSION_1_2)(StompSpec.MESSAGE, u'\\n\\\\\\c\t\\r'), u'\n\\:\t\r')
+
+    def test_escape_roundtrip(self):
+        characters = u'\\:\n\rab\xea'
+        for version in (StompSpec.VERSION_1_1, StompSpec.VERSION_1_2):
+            for length in xrange(4):
+                for text in itertools.product(characters, repeat=length):
+                    text = u''.join(text)
+                    if (version == StompSpec.VERSION_1_1) and ('\r' in text):
+                        continue
+                    self.assertEquals(unescape(version)(StompSpec.MESSAGE, escape(version)(StompSpec.SEND, text)), text)
+
+    def test_nothing_to_transform_returns_text(self):
+        for version in StompSpec.VERSIONS:
+            for text in [u'/queue/test', u'ID-host-61616-1-1-0-1-1-1', u'fen\xeatre']:
+                self.assertTrue(escape(version)(StompSpec.SEND, text) is text)
+                self.assertTrue(unescape(version)(StompSpec.MESSAGE, text) is text)
+
+class HeaderCacheTest(unittest.TestCase):
+    def test_encoder(self):
+        encode = headerEncoder(StompSpec.VERSION_1_1, StompSpec.SEND)
+        self.assertTrue(encode is headerEncoder(StompSpec.VERSION_1_1, StompSpec.SEND))
+        encode.clear()
+        self.assertEquals(encode(u'fen\xeatre:'), 'fen\xc3\xaatre\\c')
+        self.assertEquals(encode(u'destination'), 'destination')
+        self.assertEquals(encode('destination'), 'destination')
+        self.assertEquals(encode(123), '123')
+        self.assertEquals((encode.hits, encode.misses, len(encode)), (1, 2, 2))
+        self.assertEquals(headerEncoder(StompSpec.VERSION_1_1, StompSpec.CONNECT)('a:b'), 'a:b')
+        self.assertRaises(UnicodeEncodeError, headerEncoder(StompSpec.VERSION_1_0, StompSpec.SEND), u'fen\xeatre')
+
+    def test_decoder(self):
+        decode = headerDecoder(StompSpec.VERSION_1_2, StompSpec.MESSAGE)
+        decode.clear()
+        for _ in xrange(2):
+            self.assertEquals(decode('fen\xc3\xaatre:\\c:\r'), (u'fen\xeatre', u'::'))
+            self.assertEquals(decode('\r'), None)
+            self.assertRaises(StompFrameError, decode, 'no separator')
+            self.assertRaises(StompFrameError, decode, 'a:\\t')
+        self.assertEquals((decode.hits, decode.misses, len(decode)), (2, 6, 2))
+        self.assertEquals(headerDecoder(StompSpec.VERSION_1_1, StompSpec.CONNECTED)('a:\\t'), (u'a', u'\\t'))
+        self.assertRaises(UnicodeDecodeError, headerDecoder(StompSpec.VERSION_1_0, StompSpec.MESSAGE), 'fen\xc3\xaatre:')
+
+    def test_bounded_size(self):
+        decode = headerDecoder(StompSpec.VERSION_1_1, StompSpec.MESSAGE)
+        decode.clear()
+        size = decode.SIZE
+        for i in xrange(3 * size):
+            decode('message-id:%d' % i)
+            decode('destination:/queue/test')
+            self.assertTrue(len(decode) <= size)
+        self.assertEquals(decode.misses, 3 * size + 1)
+        self.assertEquals(decode.hits, 3 * size - 1)
+        decode(decode.MAX_LENGTH * 'x' + ':')
+        self.assertFalse(decode.MAX_LENGTH * 'x' + ':' in decode._current)
+
+if __name__ == '__main__':
+    unittest.main()
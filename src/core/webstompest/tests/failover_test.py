@@ -31,6 +31,16 @@ class StompFailoverUriTest(unittest.TestCase):
             {'host': 'primary', 'protocol': 'tcp', 'port': 61616},
             {'host': 'secondary', 'protocol': 'tcp', 'port': 61616}
         ])
+        self.assertEquals(configuration.socketOptions, {})
+
+    def test_configuration_socket_options(self):
+        uri = 'failover:(tcp://primary:61616)?randomize=false,tcpNoDelay=true,sendBufferSize=65536,keepAlive=false,keepAliveIdle=30'
+        configuration = StompFailoverUri(uri)
+        self.assertFalse(configuration.options['randomize'])
+        self.assertFalse('tcpNoDelay' in configuration.options)
+        self.assertEquals(configuration.socketOptions, {'tcpNoDelay': True, 'sendBufferSize': 65536, 'keepAlive': False, 'keepAliveIdle': 30})
+        self.assertEquals(StompFailoverTransport(uri).socketOptions, configuration.socketOptions)
+        self.assertRaises(ValueError, StompFailoverUri, 'tcp://localhost:61613?tcpNoDelay=1')
 
     def test_configuration_invalid_uris(self):
         for uri in [
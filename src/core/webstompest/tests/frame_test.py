@@ -1,7 +1,9 @@
 import binascii
+import copy
+import pickle
 import unittest
 
-from webstompest.protocol import StompFrame, StompSpec
+from webstompest.protocol import StompFrame, StompFrameTemplate, StompSpec
 import codecs
 
 class StompFrameTest(unittest.TestCase):
@@ -76,6 +78,114 @@ lines\x00""" % (StompSpec.SEND, StompSpec.DESTINATION_HEADER))
         rawFrame = 'SEND\nfoo:bar1\n\nsome stuff\nand more\x00'
         self.assertEquals(str(frame), rawFrame)
 
+    def test_headers_cache(self):
+        frame = StompFrame('SEND', rawHeaders=[('foo', 'bar1'), ('foo', 'bar2')])
+        headers = frame.headers
+        self.assertEquals(headers, {'foo': 'bar1'})
+        self.assertTrue(frame.headers is headers)
+        self.assertRaises(TypeError, headers.__setitem__, 'foo', 'bar0')
+        self.assertRaises(TypeError, headers.update, foo='bar0')
+        self.assertRaises(TypeError, headers.pop, 'foo')
+        self.assertEquals(frame.headers, {'foo': 'bar1'})
+        self.assertEquals(str(frame), 'SEND\nfoo:bar1\nfoo:bar2\n\n\x00')
+        copy = dict(headers)
+        copy['foo'] = 'bar0'
+        self.assertEquals(type(headers.copy()), dict)
+        self.assertEquals(frame.headers, {'foo': 'bar1'})
+
+        frame.rawHeaders.insert(0, ('foo', 'bar0'))
+        self.assertEquals(frame.headers, {'foo': 'bar0'})
+        frame.rawHeaders[0] = ('foo', 'bar3')
+        self.assertEquals(frame.headers, {'foo': 'bar3'})
+        del frame.rawHeaders[0]
+        self.assertEquals(frame.headers, {'foo': 'bar1'})
+        frame.rawHeaders += [('bar', 'foo')]
+        self.assertEquals(frame.headers, {'foo': 'bar1', 'bar': 'foo'})
+        frame.rawHeaders = [('foo', 'bar4')]
+        self.assertEquals(frame.headers, {'foo': 'bar4'})
+        self.assertEquals(frame.rawHeaders, [('foo', 'bar4')])
+
+    def test_wire_cache(self):
+        frame = StompFrame(StompSpec.SEND, {'foo': 'bar'}, 'hi')
+        wire = str(frame)
+        self.assertTrue(str(frame) is wire)
+
+        frame.headers['foo'] = 'bar2'
+        self.assertEquals(str(frame), 'SEND\nfoo:bar2\n\nhi\x00')
+        frame.headers.update(bar='foo')
+        self.assertEquals(str(frame), 'SEND\nbar:foo\nfoo:bar2\n\nhi\x00')
+        del frame.headers['bar']
+        frame.body = 'there'
+        self.assertEquals(str(frame), 'SEND\nfoo:bar2\n\nthere\x00')
+        frame.command = StompSpec.MESSAGE
+        self.assertEquals(str(frame), 'MESSAGE\nfoo:bar2\n\nthere\x00')
+        frame.headers = {'foo': 'bar:'}
+        self.assertEquals(str(frame), 'MESSAGE\nfoo:bar:\n\nthere\x00')
+        frame.version = StompSpec.VERSION_1_1
+        self.assertEquals(str(frame), 'MESSAGE\nfoo:bar\\c\n\nthere\x00')
+        frame.rawHeaders = [('foo', 'bar1')]
+        self.assertEquals(str(frame), 'MESSAGE\nfoo:bar1\n\nthere\x00')
+        frame.rawHeaders.append(('foo', 'bar2'))
+        self.assertEquals(str(frame), 'MESSAGE\nfoo:bar1\nfoo:bar2\n\nthere\x00')
+
+    def test_buffers(self):
+        body = 1000 * binascii.a2b_hex('f0000a09')
+        for frame in [
+            StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body)), 'foo': 'bar:'}, body, version=StompSpec.VERSION_1_1),
+            StompFrame(StompSpec.DISCONNECT),
+            StompFrame(0, {123: 456}, 789)
+        ]:
+            buffers = frame.buffers()
+            self.assertEquals(len(buffers), 3)
+            self.assertTrue(buffers[1] is frame.body or not isinstance(frame.body, str))
+            self.assertEquals(''.join(buffers), str(frame))
+            self.assertEquals(frame.buffers(), [str(frame)])
+
+    def test_equality(self):
+        frame = StompFrame(StompSpec.SEND, {'foo': 'bar'}, 'hi', version=StompSpec.VERSION_1_1)
+        self.assertEquals(frame, StompFrame(u'SEND', rawHeaders=[(u'foo', u'bar')], body='hi', version=StompSpec.VERSION_1_1))
+        self.assertEquals(frame, StompFrame(StompSpec.SEND, {'foo': 'bar'}, 'hi'))
+        self.assertNotEquals(frame, StompFrame(StompSpec.SEND, {'foo': 'bar:'}, 'hi'))
+        self.assertNotEquals(frame, StompFrame(StompSpec.SEND, {'foo': 'bar'}, 'ho', version=StompSpec.VERSION_1_1))
+        self.assertNotEquals(frame, StompFrame(StompSpec.SEND, rawHeaders=[('foo', 'bar'), ('foo', 'bar2')], body='hi', version=StompSpec.VERSION_1_1))
+        self.assertFalse(frame == None)
+        self.assertTrue(frame != None)
+        self.assertTrue(frame == str(frame)) # a frame equals its wire-level representation
+        self.assertEquals(StompFrame(0, {123: 456}, 789), StompFrame('0', {'123': '456'}, '789'))
+
+    def test_template(self):
+        headers = {StompSpec.DESTINATION_HEADER: '/queue/test', 'foo': 'bar:'}
+        for version in StompSpec.VERSIONS:
+            template = StompFrameTemplate(StompSpec.SEND, headers, version=version, contentLength=True)
+            self.assertEquals((template.command, template.headers, template.version), (StompSpec.SEND, headers, version))
+            for (body, messageHeaders) in [('', None), ('hi\x00there', {'foo': 'baz', 'x': 'y'}), ('hi', {StompSpec.CONTENT_LENGTH_HEADER: '1'})]:
+                frame = template.frame(body, messageHeaders)
+                expectedHeaders = dict(headers)
+                expectedHeaders[StompSpec.CONTENT_LENGTH_HEADER] = str(len(body))
+                expectedHeaders.update(messageHeaders or {})
+                self.assertEquals(frame.headers, expectedHeaders)
+                self.assertEquals(frame.body, body)
+                self.assertEquals(frame.version, version)
+                self.assertEquals(str(frame), str(StompFrame(frame.command, rawHeaders=tuple(frame.rawHeaders), body=body, version=version)))
+                frame.unraw()
+                self.assertEquals(str(frame), str(StompFrame(StompSpec.SEND, expectedHeaders, body, version=version)))
+
+        template = StompFrameTemplate(StompSpec.SEND, headers)
+        frame = template.frame('hi')
+        self.assertEquals(frame.rawHeaders, sorted(headers.iteritems()))
+        frame.rawHeaders.append(('x', 'y'))
+        self.assertEquals(str(frame), 'SEND\ndestination:/queue/test\nfoo:bar:\nx:y\n\nhi\x00')
+        self.assertEquals(str(template.frame('hi')), 'SEND\ndestination:/queue/test\nfoo:bar:\n\nhi\x00')
+
+    def test_copy_and_pickle(self):
+        frame = StompFrame(StompSpec.MESSAGE, rawHeaders=[('foo', 'bar1'), ('foo', 'bar2')], body='hi', version=StompSpec.VERSION_1_1)
+        self.assertFalse(hasattr(frame, '__dict__'))
+        copies = [copy.copy(frame), copy.deepcopy(frame)]
+        copies.extend(pickle.loads(pickle.dumps(frame, protocol)) for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1))
+        for otherFrame in copies:
+            self.assertEquals(dict(otherFrame), dict(frame))
+            self.assertEquals(otherFrame.headers, {'foo': 'bar1'})
+
     def test_non_string_arguments(self):
         message = {'command': 0, 'headers': {123: 456}, 'body': 789}
         frame = StompFrame(**message)
@@ -1,4 +1,5 @@
 import binascii
+import mmap
 import unittest
 
 from webstompest.error import StompFrameError
@@ -86,10 +87,30 @@ class StompParserTest(unittest.TestCase):
         frames = []
         while parser.canRead():
             frames.append(parser.get())
-        self.assertEquals(frames, [StompHeartBeat(), disconnect, StompHeartBeat(), StompHeartBeat(), disconnect, StompHeartBeat()])
+        self.assertEquals(frames, [StompHeartBeat(), disconnect, StompHeartBeat(), disconnect, StompHeartBeat()])
 
         self.assertEqual(parser.get(), None)
 
+    def test_heart_beat_runs_are_collapsed(self):
+        parser = StompParser(version=StompSpec.VERSION_1_1)
+        disconnect = commands.disconnect()
+        parser.add(1000 * '\n')
+        parser.add('\n')
+        parser.add('\n%s\n\n' % disconnect)
+        frames = parser.drain()
+        self.assertEquals(frames, [StompHeartBeat(), disconnect, StompHeartBeat()])
+        self.assertTrue(frames[0] is frames[2])
+        self.assertEquals(frames[0].version, StompSpec.VERSION_1_1)
+        parser.add('\n')
+        self.assertTrue(parser.get() is frames[0])
+        parser.add(1000 * '\n')
+        self.assertTrue(parser.get() is frames[0])
+        self.assertEqual(parser.get(), None)
+
+        parser = StompParser()
+        parser.add(1000 * '\n' + str(disconnect))
+        self.assertEquals(parser.drain(), [disconnect])
+
     def test_get_returns_None_if_not_done(self):
         parser = StompParser()
         self.assertEqual(None, parser.get())
@@ -204,6 +225,124 @@ class StompParserTest(unittest.TestCase):
 
         self.assertEquals(parser.get(), None)
 
+    def test_drain_and_feed(self):
+        frames = [StompFrame(StompSpec.MESSAGE, {'x': str(i)}, 'body %d' % i, version=StompSpec.VERSION_1_1) for i in xrange(5)]
+        frameBytes = ''.join(map(str, frames))
+        parser = StompParser(StompSpec.VERSION_1_1)
+        self.assertEquals(parser.drain(), [])
+        parser.add(frameBytes)
+        self.assertEquals(parser.drain(2), frames[:2])
+        self.assertEquals(parser.drain(0), [])
+        self.assertEquals(parser.drain(10), frames[2:])
+        self.assertFalse(parser.canRead())
+
+        self.assertEquals(parser.feed(frameBytes[:10]), [])
+        self.assertEquals(parser.feed(frameBytes[10:] + '\n\n'), frames + [StompHeartBeat()])
+        self.assertEquals(parser.drain(), [])
+        self.assertEquals(parser.get(), None)
+
+    def test_add_frames_split_across_chunks(self):
+        body = binascii.a2b_hex('f0000a09')
+        frames = [
+            StompFrame(StompSpec.MESSAGE, {'x': 'y', StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body, version=StompSpec.VERSION_1_1),
+            StompFrame(StompSpec.MESSAGE, {'x': 'y:z\n'}, 'some stuff\nand more', version=StompSpec.VERSION_1_1)
+        ]
+        frameBytes = '\n'.join(map(str, frames))
+        for position in xrange(len(frameBytes) + 1):
+            parser = StompParser(StompSpec.VERSION_1_1)
+            parser.add(frameBytes[:position])
+            parser.add(frameBytes[position:])
+            self.assertEquals([frame for frame in iter(parser.get, parser.SENTINEL) if frame], frames)
+
+    def test_binary_body_with_content_length_in_many_chunks(self):
+        body = 1000 * binascii.a2b_hex('f0000a09')
+        frame = StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body)
+        frameBytes = str(frame)
+        parser = StompParser()
+        for position in xrange(0, len(frameBytes), 97):
+            self.assertEquals(parser.get(), None)
+            parser.add(frameBytes[position:position + 97])
+        self.assertEquals(parser.get(), frame)
+        self.assertEquals(parser.get(), None)
+
+        parser.add('%s\ncontent-length:4\n\n\x00\x00\x00\x00trailing\x00' % StompSpec.MESSAGE)
+        self.assertEquals(parser.get().body, '\x00\x00\x00\x00trailing')
+
+    def test_delimiter_search_resumes_after_scanned_data(self):
+        frames = [
+            StompFrame(StompSpec.MESSAGE, {'x': 'y'}, 1000 * 'some body ', version=StompSpec.VERSION_1_2),
+            StompFrame(StompSpec.MESSAGE, {'x': 'z', StompSpec.CONTENT_LENGTH_HEADER: '4'}, '\x00\x00\x00\x00', version=StompSpec.VERSION_1_2)
+        ]
+        frameBytes = '\n'.join(str(frame).replace('\n\n', '\r\n\r\n', 1) for frame in frames)
+        for lazy in (False, True):
+            parser = StompParser(StompSpec.VERSION_1_2, lazy=lazy)
+            for position in xrange(len(frameBytes)):
+                parser.add(frameBytes[position])
+                if (parser.parse == parser._parseBody) and (parser._length < 0):
+                    self.assertEquals(max(parser._position, parser._scanned), parser._end) # the body received so far is never searched again
+            self.assertEquals([(frame.command, frame.headers, frame.body) for frame in iter(parser.get, parser.SENTINEL) if frame], [(frame.command, frame.headers, frame.body) for frame in frames])
+
+    def test_reserve_and_commit(self):
+        body = 1000 * binascii.a2b_hex('f0000a09')
+        frames = [
+            StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body),
+            StompFrame(StompSpec.MESSAGE, {'x': 'y'}, 'hi')
+        ]
+        frameBytes = ''.join(map(str, frames))
+        parser = StompParser()
+        for position in xrange(0, len(frameBytes), 100):
+            data = frameBytes[position:position + 100]
+            view = parser.reserve(100)
+            view[:len(data)] = data
+            del view
+            parser.commit(len(data))
+        self.assertEquals(list(iter(parser.get, parser.SENTINEL)), frames)
+
+    def test_lazy_headers(self):
+        body = binascii.a2b_hex('f0000a09')
+        for version in StompSpec.VERSIONS:
+            frames = [
+                StompFrame(StompSpec.MESSAGE, rawHeaders=[('x', 'y'), (StompSpec.CONTENT_LENGTH_HEADER, str(len(body))), ('x', 'z')], body=body, version=version),
+                StompFrame(StompSpec.DISCONNECT, {'a\\': 'b:c\t'}, version=version),
+                StompFrame(StompSpec.DISCONNECT, version=version)
+            ]
+            frameBytes = ''.join(map(str, frames))
+            if version == StompSpec.VERSION_1_2:
+                frameBytes = frameBytes.replace('\n\n', '\r\n\r\n')
+            for position in xrange(len(frameBytes) + 1):
+                parser = StompParser(version, lazy=True)
+                parser.add(frameBytes[:position])
+                parser.add(frameBytes[position:])
+                parsedFrames = []
+                while parser.canRead():
+                    parsedFrames.append(parser.get())
+                self.assertTrue(all(frame.headerBlock is not None for frame in parsedFrames))
+                self.assertEquals(parsedFrames, frames)
+                self.assertEquals(parsedFrames[0].rawHeaders, [(u'x', u'y'), (u'content-length', u'4'), (u'x', u'z')])
+
+        parser = StompParser(StompSpec.VERSION_1_1, lazy=True)
+        parser.add('%s\nno separator\n\n\x00' % StompSpec.SEND)
+        frame = parser.get()
+        self.assertRaises(StompFrameError, lambda: frame.headers)
+
+    def test_lazy_headers_with_non_ascii_bytes(self):
+        for version in (StompSpec.VERSION_1_1, StompSpec.VERSION_1_2):
+            parser = StompParser(version, lazy=True)
+            parser.add('%s\nx:\xc3\xa9\n%s:2\n\nab\x00%s\n\xc3\xa9:y\n\nc\x00' % tuple(map(str, (StompSpec.MESSAGE, StompSpec.CONTENT_LENGTH_HEADER, StompSpec.MESSAGE))))
+            frames = parser.drain()
+            self.assertEquals([frame.body for frame in frames], ['ab', 'c'])
+            self.assertEquals(frames[0].headers['x'], u'\xe9')
+            self.assertEquals(frames[1].headers[u'\xe9'], 'y')
+
+    def test_lazy_parser_reused_with_small_chunks(self):
+        frameBytes = '%s\r\n\r\n\x00' % StompSpec.CONNECTED
+        parser = StompParser(StompSpec.VERSION_1_2, lazy=True) # the receive buffer still holds the bytes of earlier frames
+        for chunkSize in xrange(1, 2 * len(frameBytes)):
+            data = 3 * frameBytes
+            for position in xrange(0, len(data), chunkSize):
+                parser.add(data[position:position + chunkSize])
+            self.assertEquals(parser.drain(), 3 * [StompFrame(StompSpec.CONNECTED, version=StompSpec.VERSION_1_2)])
+
     def test_decode(self):
         headers = {u'fen\xeatre': u'\xbfqu\xe9 tal?, s\xfc\xdf'}
         frameBytes = str(StompFrame(command=StompSpec.DISCONNECT, headers=headers, version=StompSpec.VERSION_1_1))
@@ -256,6 +395,98 @@ class StompParserTest(unittest.TestCase):
         frame = parser.get()
         self.assertEquals(frame.headers, {'\n\\': ':\t\r'})
 
+    def test_trusted(self):
+        for data in ['HELLO\nfoo:bar\n\n\x00', '%s\n\nouch!\x00' % StompSpec.DISCONNECT]:
+            self.assertRaises(StompFrameError, StompParser(StompSpec.VERSION_1_1).add, data)
+            parser = StompParser(StompSpec.VERSION_1_1, trusted=True)
+            parser.add(data)
+            self.assertEquals(str(parser.get()), data)
+        parser.add(str(commands.disconnect()))
+        self.assertTrue(parser.get().command is StompSpec.DISCONNECT)
+
+    def test_shared_commands_and_header_names(self):
+        for version in StompSpec.VERSIONS:
+            parser = StompParser(version)
+            for messageId in ('007', '008'):
+                parser.add('%s\r\n%s:%s\r\nfoo:bar\r\n\r\n\x00' % (StompSpec.MESSAGE, StompSpec.MESSAGE_ID_HEADER, messageId) if version == StompSpec.VERSION_1_2 else '%s\n%s:%s\nfoo:bar\n\n\x00' % (StompSpec.MESSAGE, StompSpec.MESSAGE_ID_HEADER, messageId))
+                frame = parser.get()
+                self.assertTrue(frame.command is StompSpec.MESSAGE)
+                self.assertEquals(frame.rawHeaders, [(StompSpec.MESSAGE_ID_HEADER, messageId), ('foo', 'bar')])
+                self.assertTrue(frame.rawHeaders[0][0] is StompSpec.MESSAGE_ID_HEADER)
+            self.assertRaises(StompFrameError, parser.add, 'MESSAGEX\n\n\x00')
+
+    def test_limits(self):
+        body = 100 * 'x'
+        frameBytes = str(StompFrame(StompSpec.MESSAGE, {'foo': 'bar', 'bar': 'foo'}, body))
+        binaryFrameBytes = str(StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body))
+        for lazy in (False, True):
+            for (limit, value, data) in [
+                ('maxLineLength', 7, 'MESSAGE\nfoo:barbaz\n\n\x00'),
+                ('maxLineLength', 7, 'MESSAGE8'),
+                ('maxLineLength', 7, 'MESSAGE\nfoo:bar\nbar:foo8'),
+                ('maxHeaders', 1, frameBytes),
+                ('maxHeaders', 1, 'MESSAGE\nfoo:bar\nbar:foo\n'),
+                ('maxBodySize', 99, frameBytes),
+                ('maxBodySize', 99, 'MESSAGE\n\n' + body),
+                ('maxBodySize', 99, binaryFrameBytes[:40])
+            ]:
+                parser = StompParser(lazy=lazy, **{limit: value})
+                self.assertRaises(StompFrameError, parser.add, data)
+                parser.add(str(StompFrame(StompSpec.MESSAGE, {'foo': 'bar'}))) # the parser recovers
+                self.assertEquals(parser.get(), StompFrame(StompSpec.MESSAGE, {'foo': 'bar'}))
+                self.assertEquals(parser.get(), None)
+
+            parser = StompParser(lazy=lazy, maxLineLength=18, maxHeaders=2, maxBodySize=100)
+            for data in (frameBytes, binaryFrameBytes):
+                parser.add(data)
+                self.assertEquals(parser.get().body, body)
+
+    def test_spilled_body(self):
+        body = 1000 * binascii.a2b_hex('f0000a09')
+        frames = [
+            StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body),
+            StompFrame(StompSpec.MESSAGE, {'x': 'y'}, body.replace('\x00', '')),
+            StompFrame(StompSpec.MESSAGE, {'x': 'y'}, 'small')
+        ]
+        frameBytes = ''.join(map(str, frames))
+        for chunkSize in (97, len(frameBytes)):
+            parser = StompParser(spillSize=100)
+            for position in xrange(0, len(frameBytes), chunkSize):
+                parser.add(frameBytes[position:position + chunkSize])
+            self.assertTrue((chunkSize == len(frameBytes)) or (len(parser._buffer) < len(body)))
+            parsedFrames = list(iter(parser.get, parser.SENTINEL))
+            self.assertEquals(parsedFrames, frames)
+            self.assertEquals([type(frame.body) for frame in parsedFrames], [mmap.mmap, mmap.mmap, str])
+            self.assertEquals(parsedFrames[0].body.read(4), body[:4])
+            self.assertEquals(''.join(map(str, parsedFrames[1].buffers())), str(frames[1]))
+
+        parser = StompParser(spillSize=100, maxBodySize=2999)
+        self.assertRaises(StompFrameError, parser.add, str(frames[1]))
+        self.assertEquals(parser._bodyFile, None)
+
+    def test_receive_buffer_is_reused(self):
+        headers = dict(('header%d' % i, 'value%d' % i) for i in xrange(10))
+        frameBytes = str(StompFrame(StompSpec.MESSAGE, headers, 'hello world', version=StompSpec.VERSION_1_1))
+        number = 100
+        for chunkSize in (len(frameBytes), 64):
+            chunks = [frameBytes[position:position + chunkSize] for position in xrange(0, len(frameBytes), chunkSize)]
+            parser = StompParser(StompSpec.VERSION_1_1)
+            for chunk in chunks: # warm up
+                parser.add(chunk)
+            transitions, buffers = [0], set()
+            transition = parser._transition
+            def _transition(state):
+                transitions[0] += 1
+                transition(state)
+            parser._transition = _transition
+            for _ in xrange(number):
+                for chunk in chunks:
+                    parser.add(chunk)
+                    buffers.add(id(parser._buffer))
+            self.assertEquals(len(parser.drain()), number + 1)
+            self.assertEquals(buffers, set([id(parser._buffer)]))
+            self.assertEquals(transitions[0], 4 * number) # heart-beat, command, headers, body -- independent of the header count and the chunk size
+
     def test_keep_first_of_repeated_headers(self):
         parser = StompParser()
         parser.add("""
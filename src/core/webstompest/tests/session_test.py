@@ -235,6 +235,30 @@ class StompSessionTest(unittest.TestCase):
         session = StompSession(version=StompSpec.VERSION_1_1)
         self.assertRaises(StompProtocolError, lambda: session.nack(frame_({StompSpec.MESSAGE_ID_HEADER: '4711', StompSpec.SUBSCRIPTION_HEADER: 'bla'})))
 
+    def test_session_trusted(self):
+        headers = {StompSpec.DESTINATION_HEADER: '/queue/test', StompSpec.MESSAGE_ID_HEADER: '007', StompSpec.SUBSCRIPTION_HEADER: '0', StompSpec.ACK_HEADER: '007'}
+        for version in StompSpec.VERSIONS:
+            sessions = [StompSession(version, trusted=trusted) for trusted in (False, True)]
+            for session in sessions:
+                session.connect(login='', passcode='', versions=[version])
+                self.assertRaises(StompProtocolError, session.connected, StompFrame(StompSpec.MESSAGE, version=version)) # CONNECTED is always checked
+                session.connected(StompFrame(StompSpec.CONNECTED, {StompSpec.VERSION_HEADER: version}))
+                session.subscribe('/queue/test', {StompSpec.ID_HEADER: '0'}, receipt='4711')
+            frame = StompFrame(StompSpec.MESSAGE, headers, version=version)
+            self.assertEquals(sessions[1].message(frame), sessions[0].message(frame))
+            self.assertEquals(sessions[1].ack(frame), sessions[0].ack(frame))
+            if version != StompSpec.VERSION_1_0:
+                self.assertEquals(sessions[1].nack(frame), sessions[0].nack(frame))
+            receipt = StompFrame(StompSpec.RECEIPT, {StompSpec.RECEIPT_ID_HEADER: '4711'}, version=version)
+            self.assertEquals(sessions[1].receipt(receipt), sessions[0].receipt(receipt))
+
+            frame = StompFrame(StompSpec.ERROR, {StompSpec.DESTINATION_HEADER: '/queue/test', StompSpec.SUBSCRIPTION_HEADER: '0'}, version=version)
+            self.assertRaises(StompProtocolError, sessions[0].message, frame)
+            self.assertEquals(sessions[1].message(frame), (StompSpec.ID_HEADER, '0'))
+            frame = StompFrame(StompSpec.MESSAGE, {StompSpec.SUBSCRIPTION_HEADER: '1'}, version=version)
+            for session in sessions:
+                self.assertRaises(StompProtocolError, session.message, frame) # the subscription is still checked
+
     def test_session_transaction(self):
         session = StompSession(check=False)
 
@@ -1,12 +1,14 @@
 import logging
+import socket
 import unittest
 
-from mock import Mock
+from mock import Mock, patch
 
 from webstompest.config import StompConfig
 from webstompest.error import StompConnectionError, StompProtocolError
 from webstompest.protocol import commands, StompFrame, StompSpec
 from webstompest.sync import Stomp
+from webstompest.sync.transport import StompFrameTransport, readable
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -158,5 +160,103 @@ class SimpleStompTest(unittest.TestCase):
             sentFrame = args[0]
             self.assertEquals(StompFrame(StompSpec.ABORT, {StompSpec.TRANSACTION_HEADER: transaction}), sentFrame)
 
+    def test_connection_state_is_tracked_from_io_results(self):
+        stomp = Stomp(CONFIG)
+        transport = stomp._transport = StompFrameTransport(HOST, PORT)
+        transport._socket = Mock()
+        transport._socket.sendall.side_effect = IOError('broken pipe')
+        self.assertRaises(StompConnectionError, stomp.send, '/queue/foo', 'test message')
+        self.assertFalse(transport.connected)
+        self.assertRaises(StompConnectionError, stomp.send, '/queue/foo', 'test message')
+        self.assertEquals(stomp._Stomp__transport, None)
+
+    def test_overdue_server_heart_beat_probes_connection(self):
+        (client, server) = socket.socketpair()
+        try:
+            stomp = Stomp(CONFIG)
+            transport = stomp._transport = StompFrameTransport(HOST, PORT)
+            transport._socket = server
+            stomp.session.received()
+            stomp._heartBeatTimeout = 60
+            with patch('webstompest.sync.transport.readable', Mock(wraps=readable)) as readable_:
+                stomp.send('/queue/foo', 'test message')
+                self.assertEquals(readable_.call_count, 0)
+                client.close()
+                stomp._heartBeatTimeout = 1e-6
+                self.assertRaises(StompConnectionError, stomp.send, '/queue/foo', 'test message')
+                self.assertEquals(readable_.call_count, 1)
+            self.assertEquals(stomp._Stomp__transport, None)
+        finally:
+            server.close()
+            client.close()
+
+    def test_overdue_server_heart_beat_probe_does_not_block_on_partial_frame(self):
+        (client, server) = socket.socketpair()
+        try:
+            stomp = Stomp(CONFIG)
+            transport = stomp._transport = StompFrameTransport(HOST, PORT)
+            transport._socket = server
+            server.settimeout(1) # a blocking read would fail instead of hanging
+            stomp.session.received()
+            stomp._heartBeatTimeout = 1e-6
+            message = str(StompFrame(StompSpec.MESSAGE, {StompSpec.MESSAGE_ID_HEADER: '4711', StompSpec.DESTINATION_HEADER: '/queue/foo'}, 'hi'))
+            client.sendall(message[:10])
+            stomp.send('/queue/foo', 'test message')
+            self.assertTrue(transport.connected)
+            self.assertEquals(list(stomp._messages), [])
+            client.sendall(message[10:])
+            stomp.send('/queue/foo', 'test message')
+            self.assertEquals([frame.body for frame in stomp._messages], ['hi'])
+            self.assertEquals(stomp.receiveFrame().headers[StompSpec.MESSAGE_ID_HEADER], '4711')
+        finally:
+            server.close()
+            client.close()
+
+    def test_socket_options(self):
+        stomp = Stomp(StompConfig('tcp://%s:%s?sendBufferSize=4096,tcpNoDelay=false' % (HOST, PORT), tcpNoDelay=True, keepAlive=True))
+        stomp._transportFactory = Mock()
+        stomp._transportFactorySelector({'protocol': 'tcp', 'host': HOST, 'port': PORT})
+        _, kwargs = stomp._transportFactory.call_args
+        self.assertEquals(kwargs['socketOptions'], {'sendBufferSize': 4096, 'tcpNoDelay': False, 'keepAlive': True})
+
+    def test_batch(self):
+        stomp = self._get_transport_mock()
+        with stomp.batch():
+            stomp.send('/queue/foo', 'test message')
+            stomp._transport.cork.assert_called_once_with()
+            self.assertEquals(stomp._transport.uncork.call_count, 0)
+        stomp._transport.uncork.assert_called_once_with()
+        try:
+            with stomp.batch():
+                raise RuntimeError('poof')
+        except RuntimeError:
+            pass
+        self.assertEquals(stomp._transport.uncork.call_count, 2)
+        stomp.flush()
+        stomp._transport.flush.assert_called_once_with()
+
+    def test_batch_writes_frames_at_once(self):
+        (client, server) = socket.socketpair()
+        try:
+            stomp = Stomp(CONFIG)
+            transport = stomp._transport = StompFrameTransport(HOST, PORT)
+            transport._socket = server
+            for _ in xrange(3):
+                stomp.send('/queue/foo', 'hello world', {'x': 'y'})
+            self.assertEquals(transport.writes, 3)
+            with stomp.batch():
+                for _ in xrange(3):
+                    stomp.send('/queue/foo', 'hello world', {'x': 'y'})
+                self.assertEquals(transport.writes, 3)
+            self.assertEquals(transport.writes, 4)
+            frame = str(StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/foo', 'x': 'y'}, 'hello world'))
+            received = ''
+            while len(received) < 6 * len(frame):
+                received += client.recv(65536)
+            self.assertEquals(received, 6 * frame)
+        finally:
+            server.close()
+            client.close()
+
 if __name__ == '__main__':
     unittest.main()
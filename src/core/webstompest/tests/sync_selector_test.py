@@ -0,0 +1,121 @@
+import logging
+import socket
+import time
+import unittest
+
+from webstompest.config import StompConfig
+from webstompest.protocol import StompFrame, StompSpec
+from webstompest.sync import Stomp, StompSelector
+from webstompest.sync.transport import StompFrameTransport
+
+logging.basicConfig(level=logging.DEBUG)
+
+HOST = 'fakeHost'
+PORT = 61613
+
+CONFIG = StompConfig('tcp://%s:%s' % (HOST, PORT), version=StompSpec.VERSION_1_1, check=False)
+
+class StompSelectorTest(unittest.TestCase):
+    def setUp(self):
+        self.sockets = []
+
+    def tearDown(self):
+        for socket_ in self.sockets:
+            socket_.close()
+
+    def _get_client(self, heartBeat=0):
+        (client, server) = socket.socketpair()
+        self.sockets.extend([client, server])
+        stomp = Stomp(CONFIG)
+        transport = stomp._transport = StompFrameTransport(HOST, PORT)
+        transport._socket = client
+        stomp.session.connect(heartBeats=(heartBeat, 0))
+        stomp.session.connected(StompFrame(StompSpec.CONNECTED, {StompSpec.VERSION_HEADER: StompSpec.VERSION_1_1, StompSpec.HEART_BEAT_HEADER: '0,%d' % heartBeat}))
+        stomp.session.sent()
+        stomp._transport.setVersion(StompSpec.VERSION_1_1)
+        return stomp, server
+
+    def _message(self, body):
+        return str(StompFrame(StompSpec.MESSAGE, {StompSpec.MESSAGE_ID_HEADER: body, StompSpec.DESTINATION_HEADER: '/queue/test'}, body, version=StompSpec.VERSION_1_1))
+
+    def test_select(self):
+        (client1, server1) = self._get_client()
+        (client2, server2) = self._get_client()
+        selector = StompSelector([client1, client2])
+        self.assertEquals(len(selector), 2)
+        self.assertTrue(client1 in selector)
+
+        self.assertEquals(list(selector.select(0.01)), [])
+
+        server1.sendall(self._message('1') + StompSpec.LINE_DELIMITER + self._message('2'))
+        partial = self._message('3')
+        server2.sendall(partial[:10])
+        self.assertEquals([(client, frame.body) for (client, frame) in selector.select(1)], [(client1, '1'), (client1, '2')])
+        self.assertEquals(list(selector.select(0.01)), [])
+
+        server2.sendall(partial[10:])
+        self.assertEquals([(client, frame.body) for (client, frame) in selector.select()], [(client2, '3')])
+
+        selector.unregister(client2)
+        self.assertFalse(client2 in selector)
+        server2.sendall(self._message('4'))
+        self.assertEquals(list(selector.select(0.01)), [])
+        self.assertTrue(client2.canRead(1))
+        self.assertEquals(client2.receiveFrame().body, '4')
+        selector.close()
+
+    def test_frames_already_parsed_are_yielded_without_waiting(self):
+        (client, server) = self._get_client()
+        server.sendall(self._message('1') + self._message('2') + self._message('3')[:10])
+        client._transport.read() # the parser now holds two complete frames, but the socket has no more data
+        selector = StompSelector([client])
+        start = time.time()
+        self.assertEquals([frame.body for (_, frame) in selector.select(1)], ['1', '2'])
+        self.assertTrue((time.time() - start) < 0.5)
+        self.assertEquals(list(selector.select(0.01)), [])
+
+    def test_partial_frame_with_overdue_server_heart_beat(self):
+        (client, server) = self._get_client(heartBeat=20)
+        client._transport._socket.settimeout(1) # a blocking read would fail instead of hanging
+        client.session.received()
+        client._heartBeatTimeout = 1e-6 # the client probes its connection whenever the selector services it
+        partial = self._message('1')
+        server.sendall(partial[:10])
+        selector = StompSelector([client])
+        self.assertEquals(list(selector.select(0.05)), [])
+        server.sendall(partial[10:])
+        self.assertEquals([frame.body for (_, frame) in selector.select(1)], ['1'])
+
+    def test_lost_connection(self):
+        (client1, server1) = self._get_client()
+        (client2, _) = self._get_client()
+        selector = StompSelector([client1, client2])
+        server1.sendall(self._message('1'))
+        server1.close()
+        self.assertEquals([(client, frame and frame.body) for (client, frame) in selector.select()], [(client1, '1')])
+        self.assertEquals(list(selector.select()), [(client1, None)])
+        self.assertEquals(len(selector), 1)
+        self.assertFalse(client1 in selector)
+        self.assertRaises(Exception, client1.canRead, 0)
+        self.assertEquals(list(StompSelector().select()), [])
+
+    def test_heart_beats(self):
+        (client, server) = self._get_client(heartBeat=20)
+        (quiet, _) = self._get_client()
+        selector = StompSelector([client, quiet])
+        self.assertEquals(list(selector.select(0.1)), [])
+        beats = server.recv(1024)
+        self.assertTrue(len(beats) >= 3)
+        self.assertEquals(beats, len(beats) * StompSpec.LINE_DELIMITER)
+        self.assertEquals(quiet.clientHeartBeat, 0)
+
+    def test_pending_frames_are_flushed_before_waiting(self):
+        (client, server) = self._get_client()
+        client._transport.writeBufferSize = 65536
+        client.send('/queue/test', 'hello')
+        selector = StompSelector([client])
+        self.assertEquals(list(selector.select(0.01)), [])
+        self.assertTrue(server.recv(1024).startswith(StompSpec.SEND))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 import binascii
 import itertools
 import logging
+import os
 import select
+import socket
 import unittest
 
 from mock import Mock
@@ -9,7 +11,8 @@ from mock import patch
 
 from webstompest.error import StompConnectionError
 from webstompest.protocol import StompFrame, StompSpec
-from webstompest.sync.transport import StompFrameTransport
+from webstompest.protocol.frame import StompHeartBeat
+from webstompest.sync.transport import StompFrameTransport, readable
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -29,7 +32,11 @@ class StompFrameTransportTest(unittest.TestCase):
         connected.return_value = True
         socket = transport._socket = Mock()
         stream = self._generate_bytes(stream)
-        socket.recv = Mock(wraps=lambda size: ''.join(itertools.islice(stream, size)))
+        def recv_into(view, size):
+            data = ''.join(itertools.islice(stream, size))
+            view[:len(data)] = data
+            return len(data)
+        socket.recv_into = Mock(wraps=recv_into)
         return transport
 
     def _get_send_mock(self):
@@ -48,6 +55,108 @@ class StompFrameTransportTest(unittest.TestCase):
         args, _ = transport._socket.sendall.call_args
         self.assertEquals(str(frame), args[0])
 
+    def test_send_large_frame(self):
+        body = StompFrameTransport.JOIN_SIZE * 'x'
+        frame = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, body)
+
+        transport = self._get_send_mock()
+        transport.send(frame)
+        self.assertEquals(2, transport._socket.sendall.call_count) # the frame delimiter goes with the body
+        data = [args[0] for (args, _) in transport._socket.sendall.call_args_list]
+        self.assertEquals(data[1], body + StompSpec.FRAME_DELIMITER)
+        self.assertEquals(str(frame), ''.join(data))
+
+    def test_send_heart_beat(self):
+        transport = self._get_send_mock()
+        transport.send(StompHeartBeat())
+        transport._socket.sendall.assert_called_once_with(StompSpec.LINE_DELIMITER)
+
+    def test_send_buffered(self):
+        frames = [StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, str(i)) for i in xrange(4)]
+        size = len(str(frames[0]))
+        transport = self._get_send_mock()
+        transport.writeBufferSize = 3 * size
+        sendall = transport._socket.sendall
+        for frame in frames[:2]:
+            transport.send(frame)
+        self.assertEquals(0, sendall.call_count)
+        transport.send(frames[2])
+        sendall.assert_called_once_with(''.join(map(str, frames[:3])))
+
+        transport.send(frames[3])
+        body = (2 * transport.JOIN_SIZE) * 'x'
+        large = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, body)
+        transport.send(large)
+        data = [args[0] for (args, _) in sendall.call_args_list]
+        self.assertEquals(data[1], str(frames[3]))
+        self.assertEquals(data[3], body + StompSpec.FRAME_DELIMITER)
+        self.assertEquals(4, transport.writes)
+
+        transport.maxWriteDelay = 0
+        transport.send(frames[0])
+        self.assertEquals(sendall.call_args[0][0], str(frames[0]))
+
+        transport.maxWriteDelay = None
+        transport.send(frames[1])
+        with patch('webstompest.sync.transport.readable') as readable_:
+            readable_.return_value = False
+            self.assertFalse(transport.canRead(0))
+        self.assertEquals(sendall.call_args[0][0], str(frames[1]))
+
+    def test_send_corked(self):
+        frame = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'})
+        transport = self._get_send_mock()
+        sendall = transport._socket.sendall
+        transport.send(frame)
+        self.assertEquals(1, sendall.call_count)
+        transport.cork()
+        transport.send(frame)
+        transport.cork()
+        transport.send(frame)
+        transport.uncork()
+        self.assertEquals(1, sendall.call_count)
+        transport.flush()
+        self.assertEquals(2, sendall.call_count)
+        self.assertEquals(sendall.call_args[0][0], 2 * str(frame))
+        transport.send(frame)
+        transport.uncork()
+        self.assertEquals(3, sendall.call_count)
+        transport.cork()
+        transport.send(frame)
+        socket_ = transport._socket
+        transport.disconnect()
+        socket_.sendall.assert_called_with(str(frame))
+        socket_.close.assert_called_once_with()
+
+    def test_send_large_frame_corked(self):
+        small = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, 'hi')
+        body = (2 * StompFrameTransport.JOIN_SIZE) * 'x'
+        large = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/test'}, body)
+        transport = self._get_send_mock()
+        sendall = transport._socket.sendall
+        transport.cork()
+        for frame in (small, large, small):
+            transport.send(frame)
+        self.assertEquals(0, sendall.call_count)
+        transport.uncork()
+        data = [args[0] for (args, _) in sendall.call_args_list]
+        self.assertEquals(3, len(data))
+        self.assertEquals(data[1], body + StompSpec.FRAME_DELIMITER)
+        self.assertEquals(''.join(data), str(small) + str(large) + str(small))
+
+    def test_connect_sets_socket_options(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            transport = StompFrameTransport(*server.getsockname(), socketOptions={'tcpNoDelay': True, 'keepAlive': True})
+            transport.connect()
+            self.assertTrue(transport._socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+            self.assertTrue(transport._socket.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            transport.disconnect()
+        finally:
+            server.close()
+
     def test_send_not_connected_raises(self):
         frame = StompFrame(StompSpec.MESSAGE)
 
@@ -64,7 +173,7 @@ class StompFrameTransportTest(unittest.TestCase):
         transport = self._get_receive_mock(str(frame))
         frame_ = transport.receive()
         self.assertEquals(frame, frame_)
-        self.assertEquals(1, transport._socket.recv.call_count)
+        self.assertEquals(1, transport._socket.recv_into.call_count)
 
         self.assertRaises(StompConnectionError, transport.receive)
         self.assertEquals(transport._socket, None)
@@ -85,7 +194,7 @@ class StompFrameTransportTest(unittest.TestCase):
         self.assertEquals(frame, frame_)
         frame_ = transport.receive()
         self.assertEquals(frame, frame_)
-        self.assertEquals(1, transport._socket.recv.call_count)
+        self.assertEquals(1, transport._socket.recv_into.call_count)
 
         self.assertRaises(StompConnectionError, transport.receive)
         self.assertEquals(transport._socket, None)
@@ -98,7 +207,7 @@ class StompFrameTransportTest(unittest.TestCase):
         transport = self._get_receive_mock(str(frame))
         frame_ = transport.receive()
         self.assertEquals(frame, frame_)
-        self.assertEquals(1, transport._socket.recv.call_count)
+        self.assertEquals(1, transport._socket.recv_into.call_count)
 
         self.assertRaises(StompConnectionError, transport.receive)
         self.assertEquals(transport._socket, None)
@@ -115,28 +224,89 @@ class StompFrameTransportTest(unittest.TestCase):
         self.assertEquals(StompSpec.MESSAGE, frame.command)
         self.assertEquals(headers, frame.headers)
         self.assertEquals(body1, frame.body)
-        self.assertEquals(1, transport._socket.recv.call_count)
+        self.assertEquals(1, transport._socket.recv_into.call_count)
 
         frame = transport.receive()
         self.assertEquals(StompSpec.MESSAGE, frame.command)
         self.assertEquals(headers, frame.headers)
         self.assertEquals(body2, frame.body)
-        self.assertEquals(1, transport._socket.recv.call_count)
+        self.assertEquals(1, transport._socket.recv_into.call_count)
 
         self.assertRaises(StompConnectionError, transport.receive)
         self.assertEquals(transport._socket, None)
 
-    @patch('select.select')
-    def test_can_connect_eintr_retries_connection(self, select_call):
-        select_call.return_value = (Mock(), Mock(), Mock())
+    def test_receive_adapts_read_size(self):
+        body = 100000 * 'x'
+        frame = StompFrame(StompSpec.MESSAGE, {StompSpec.CONTENT_LENGTH_HEADER: str(len(body))}, body)
+
+        transport = self._get_receive_mock(str(frame) + str(StompFrame(StompSpec.MESSAGE)))
+        self.assertEquals(transport.READ_SIZE, transport.readSize)
+        self.assertEquals(frame, transport.receive())
+        sizes = [args[1] for (args, _) in transport._socket.recv_into.call_args_list]
+        self.assertEquals(sizes, [4096, 8192, 16384, 32768, 65536])
+        self.assertEquals(transport.readSize, 65536) # last read was short, but not less than half
+        self.assertEquals(StompFrame(StompSpec.MESSAGE), transport.receive())
+        self.assertEquals(5, transport.reads)
+        self.assertEquals(2, transport.frames)
+        self.assertEquals(2.5, transport.readsPerFrame)
+
+        transport = StompFrameTransport(HOST, PORT, readSize=1024, maxReadSize=2048)
+        transport._adaptReadSize(1024)
+        transport._adaptReadSize(2048)
+        self.assertEquals(2048, transport.readSize)
+        transport._adaptReadSize(0)
+        transport._adaptReadSize(0)
+        self.assertEquals(1024, transport.readSize)
+
+    @patch('select.poll')
+    def test_can_connect_eintr_retries_connection(self, poll_call):
+        poll = poll_call.return_value.poll
+        poll.return_value = [(3, select.POLLIN)]
         transport = self._get_receive_mock('test')
+        def raise_eintr_once(*args):
+            poll.side_effect = None
+            raise select.error(4, 'Interrupted system call')
+        poll.side_effect = raise_eintr_once
+
+        self.assertTrue(transport.canRead())
+        self.assertEquals(2, poll.call_count)
+        self.assertEquals([None, None], [args[0] for (args, _) in poll.call_args_list])
+
+    @patch('select.select')
+    def test_readable_without_poll_eintr_retries_with_remaining_timeout(self, select_call):
+        select_call.return_value = ([], [], [])
         def raise_eintr_once(*args):
             select_call.side_effect = None
             raise select.error(4, 'Interrupted system call')
         select_call.side_effect = raise_eintr_once
 
-        transport.canRead()
+        self.assertFalse(readable(Mock(), 10, poll=False))
         self.assertEquals(2, select_call.call_count)
+        timeouts = [args[3] for (args, _) in select_call.call_args_list]
+        self.assertEquals(10, timeouts[0])
+        self.assertTrue(0 <= timeouts[1] <= 10)
+
+    def test_readable_with_file_descriptor_beyond_fd_setsize(self):
+        (client, server) = socket.socketpair()
+        fileno = 2048
+        try:
+            try:
+                os.dup2(server.fileno(), fileno)
+            except OSError:
+                self.skipTest('Cannot open file descriptor %d' % fileno)
+            server_ = Mock()
+            server_.fileno.return_value = fileno
+            self.assertRaises(ValueError, readable, server_, 0, poll=False)
+            self.assertFalse(readable(server_, 0))
+            client.sendall('\n')
+            self.assertTrue(readable(server_, 1))
+        finally:
+            try:
+                os.close(fileno)
+            except OSError:
+                pass
+            client.close()
+            server.close()
 
 if __name__ == '__main__':
     unittest.main()
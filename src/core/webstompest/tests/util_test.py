@@ -1,6 +1,10 @@
+import socket
 import unittest
 
-from webstompest.util import filterReservedHeaders
+from mock import Mock
+
+from webstompest.config import StompConfig
+from webstompest.util import filterReservedHeaders, setSocketOptions, socketOptions
 
 class UtilTest(unittest.TestCase):
     def test_filterReservedHeaders(self):
@@ -12,5 +16,31 @@ class UtilTest(unittest.TestCase):
         self.assertFalse('timestamp' in filteredHdrs)
         self.assertTrue('foo' in filteredHdrs)
 
+    def test_setSocketOptions(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        client = socket.create_connection(server.getsockname())
+        try:
+            setSocketOptions(client, tcpNoDelay=True, keepAlive=True, receiveBufferSize=None, quickAck=True)
+            self.assertTrue(client.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+            self.assertTrue(client.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            setSocketOptions(client, tcpNoDelay=False)
+            self.assertFalse(client.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        finally:
+            client.close()
+            server.close()
+
+        socket_ = Mock()
+        setSocketOptions(socket_, sendBufferSize=65536, keepAliveCount=None)
+        socket_.setsockopt.assert_called_once_with(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
+        self.assertRaises(KeyError, setSocketOptions, socket_, noSuchOption=True)
+
+    def test_socketOptions(self):
+        config = StompConfig('tcp://localhost:61613', tcpNoDelay=True, sendBufferSize=1024)
+        self.assertEquals(socketOptions(config), {'tcpNoDelay': True, 'sendBufferSize': 1024})
+        self.assertEquals(socketOptions(config, {'sendBufferSize': 2048, 'keepAlive': True}), {'tcpNoDelay': True, 'sendBufferSize': 2048, 'keepAlive': True})
+        self.assertEquals(socketOptions(StompConfig('tcp://localhost:61613')), {})
+
 if __name__ == '__main__':
     unittest.main()
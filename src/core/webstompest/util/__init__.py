@@ -1,10 +1,13 @@
 import copy
 import functools
+import socket
 
-from webstompest.protocol import StompSpec
+from webstompest.protocol import StompFailoverUri, StompSpec
 
 _RESERVED_HEADERS = set([StompSpec.MESSAGE_ID_HEADER, StompSpec.DESTINATION_HEADER, u'timestamp', u'expires', u'priority'])
 
+SOCKET_OPTIONS = StompFailoverUri.SOCKET_OPTIONS # the socket options which are accepted by StompConfig and by failover URIs
+
 def filterReservedHeaders(headers):
     return dict((header, value) for (header, value) in headers.iteritems() if header not in _RESERVED_HEADERS)
 
@@ -17,6 +20,20 @@ def checkattr(attribute):
         return __checkattr
     return _checkattr
 
+def setSocketOptions(socket_, **options):
+    """Tune a TCP socket. The keyword arguments are the keys of :attr:`SOCKET_OPTIONS`; options which are :obj:`None` are left at their system defaults, and options which the platform does not support (e.g., **quickAck** on anything but Linux) are ignored."""
+    for (name, value) in options.iteritems():
+        (level, option, _) = SOCKET_OPTIONS[name]
+        if (value is None) or not hasattr(socket, option):
+            continue
+        socket_.setsockopt(getattr(socket, level), getattr(socket, option), int(value))
+
+def socketOptions(config, overrides=None):
+    """The socket options of a :class:`~.StompConfig` object which are not :obj:`None`, updated by **overrides** (the socket options of the failover URI)."""
+    options = dict((name, getattr(config, name, None)) for name in SOCKET_OPTIONS)
+    options.update(overrides or {})
+    return dict((name, value) for (name, value) in options.iteritems() if value is not None)
+
 def cloneFrame(frame, persistent=None):
     frame = copy.deepcopy(frame)
     frame.unraw()